@@ -0,0 +1,114 @@
+"""
+archive.py – Hot/archive split for patients and event logs
+
+`patients` and `event_logs` only hold the current day, so every live query
+(status filters, the in-consultation lookup, stats reconciliation) touches a
+small table. Once a day the previous days' rows move to `patients_archive` and
+`event_logs_archive`; historical reads go through the helpers below, which look
+in both.
+"""
+from datetime import date, timedelta
+from typing import Optional, Union
+
+from sqlalchemy import delete, desc, insert, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import (
+    EventLog,
+    EventLogArchive,
+    Patient,
+    PatientArchive,
+    PatientStatus,
+    clinic_day_start,
+)
+
+# Columns copied verbatim from the hot tables into their archives
+PATIENT_ARCHIVE_COLUMNS = (
+    "id", "token_number", "name", "phone", "reason", "urgency", "status",
+    "assigned_doctor_id", "created_at", "consultation_start", "consultation_end", "visit_date",
+)
+EVENT_ARCHIVE_COLUMNS = ("id", "event_type", "reference_id", "metadata_json", "timestamp")
+
+
+async def archive_past_visits(db: AsyncSession, today: date) -> dict:
+    """
+    Move visits dated before `today` and events logged before its clinic-local
+    midnight into the archive tables, in one transaction. A consultation still
+    running across midnight stays in `patients` until the next run.
+    Returns the number of rows moved per table.
+    """
+    cutoff = clinic_day_start(today)
+
+    patient_filter = (
+        Patient.visit_date < today,
+        Patient.status != PatientStatus.IN_CONSULTATION,
+    )
+    await db.execute(
+        insert(PatientArchive).from_select(
+            PATIENT_ARCHIVE_COLUMNS,
+            select(*(getattr(Patient, col) for col in PATIENT_ARCHIVE_COLUMNS)).where(*patient_filter),
+        )
+    )
+    moved_patients = await db.execute(delete(Patient).where(*patient_filter))
+
+    await db.execute(
+        insert(EventLogArchive).from_select(
+            EVENT_ARCHIVE_COLUMNS,
+            select(*(getattr(EventLog, col) for col in EVENT_ARCHIVE_COLUMNS)).where(EventLog.timestamp < cutoff),
+        )
+    )
+    moved_events = await db.execute(delete(EventLog).where(EventLog.timestamp < cutoff))
+
+    await db.commit()
+    return {"patients": moved_patients.rowcount, "event_logs": moved_events.rowcount}
+
+
+async def get_patient_record(db: AsyncSession, patient_id: int) -> Optional[Union[Patient, PatientArchive]]:
+    """A patient by id from today's table, falling back to the archive."""
+    result = await db.execute(select(Patient).where(Patient.id == patient_id))
+    patient = result.scalar_one_or_none()
+    if patient is not None:
+        return patient
+    result = await db.execute(select(PatientArchive).where(PatientArchive.id == patient_id))
+    return result.scalar_one_or_none()
+
+
+async def get_visits_on(db: AsyncSession, visit_date: date) -> list[dict]:
+    """Every visit on `visit_date`, whichever table it currently lives in."""
+    columns = ("id", "token_number", "name", "reason", "urgency", "status",
+               "assigned_doctor_id", "created_at", "consultation_start", "consultation_end")
+    hot = select(*(getattr(Patient, c) for c in columns)).where(Patient.visit_date == visit_date)
+    cold = select(*(getattr(PatientArchive, c) for c in columns)).where(PatientArchive.visit_date == visit_date)
+    rows = await db.execute(union_all(hot, cold).order_by("token_number"))
+    return [
+        {
+            **row._asdict(),
+            "status": row.status.value if isinstance(row.status, PatientStatus) else row.status,
+        }
+        for row in rows
+    ]
+
+
+async def get_events_on(db: AsyncSession, day: date, limit: int = 500) -> list[dict]:
+    """
+    Event log entries of the clinic-local `day`, newest first, whichever table
+    they currently live in (a day can straddle both until the archive job runs).
+    """
+    start, end = clinic_day_start(day), clinic_day_start(day + timedelta(days=1))
+    hot = select(*(getattr(EventLog, c) for c in EVENT_ARCHIVE_COLUMNS)).where(
+        EventLog.timestamp >= start, EventLog.timestamp < end
+    )
+    cold = select(*(getattr(EventLogArchive, c) for c in EVENT_ARCHIVE_COLUMNS)).where(
+        EventLogArchive.timestamp >= start, EventLogArchive.timestamp < end
+    )
+    rows = await db.execute(union_all(hot, cold).order_by(desc("timestamp")).limit(limit))
+    return [
+        {
+            "id": row.id,
+            "event_type": row.event_type,
+            "reference_id": row.reference_id,
+            "metadata": row.metadata_json,
+            "timestamp": row.timestamp.isoformat(),
+        }
+        for row in rows
+    ]
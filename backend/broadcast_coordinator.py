@@ -0,0 +1,93 @@
+"""
+broadcast_coordinator.py – Coalesced, debounced queue broadcasts
+
+Mutations only mark the queue dirty. At most one snapshot is built and emitted per
+BROADCAST_WINDOW_MS, from its own DB session, and the emit is skipped entirely when
+the snapshot's content fingerprint matches the last one broadcast.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Optional
+
+from config import settings
+
+FINGERPRINT_KEY = "mediq:broadcast:fingerprint"   # Last broadcast snapshot fingerprint
+
+# Fields that drift with the clock rather than with queue content
+VOLATILE_ENTRY_FIELDS = ("priority_score",)
+
+
+def snapshot_fingerprint(queue_data: list[dict], stats: dict) -> str:
+    """Content hash of a queue snapshot, ignoring clock-derived fields."""
+    stable_queue = [
+        {k: v for k, v in entry.items() if k not in VOLATILE_ENTRY_FIELDS}
+        for entry in queue_data
+    ]
+    payload = json.dumps({"queue": stable_queue, "stats": stats}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+async def broadcast_if_changed(queue_data: list[dict], stats: dict) -> bool:
+    """
+    Emit the snapshot unless its fingerprint equals the last one broadcast.
+    The fingerprint lives in Redis so API workers and Celery share it.
+    Returns True if an emit happened.
+    """
+    from redis_client import get_redis
+    from websocket_manager import broadcast_queue_updated
+
+    fingerprint = snapshot_fingerprint(queue_data, stats)
+    previous = await get_redis().set(FINGERPRINT_KEY, fingerprint, get=True)
+    if previous == fingerprint:
+        return False
+    await broadcast_queue_updated(queue_data, stats)
+    return True
+
+
+class QueueBroadcaster:
+    """Marks the queue dirty and flushes at most once per window (trailing edge)."""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(self.window_seconds)
+            self._dirty = False
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"[WS] Queue broadcast failed: {exc}")
+
+    async def flush(self) -> bool:
+        """Build the current snapshot in a fresh session and emit it if it changed."""
+        from database import AsyncSessionLocal
+        from queue_engine import get_ordered_queue, get_queue_stats
+
+        async with AsyncSessionLocal() as db:
+            queue_data = await get_ordered_queue(db)
+            stats = await get_queue_stats()
+        return await broadcast_if_changed(queue_data, stats)
+
+
+queue_broadcaster = QueueBroadcaster(settings.BROADCAST_WINDOW_MS / 1000.0)
+
+
+async def mark_queue_dirty(roster_changed: bool = False) -> None:
+    """
+    Request a (coalesced) queue broadcast after a mutation, and invalidate the HTTP
+    validators of the queue/stats (and, if `roster_changed`, the doctor roster).
+    """
+    from redis_client import QUEUE_VERSION_KEY, ROSTER_VERSION_KEY, bump_resource_versions
+
+    keys = (QUEUE_VERSION_KEY, ROSTER_VERSION_KEY) if roster_changed else (QUEUE_VERSION_KEY,)
+    await bump_resource_versions(*keys)
+    queue_broadcaster.mark_dirty()
@@ -17,7 +17,7 @@ celery_app.conf.update(
     task_serializer="json",
     result_serializer="json",
     accept_content=["json"],
-    timezone="Asia/Kolkata",
+    timezone=settings.CLINIC_TIMEZONE,
     enable_utc=True,
     beat_schedule={
         # Recalculate queue priority scores every 60 seconds so wait times are fresh
@@ -25,6 +25,11 @@ celery_app.conf.update(
             "task": "backend.celery_tasks.recalculate_queue_task",
             "schedule": 60.0,
         },
+        # Repair drift in the Redis stats counters every 5 minutes
+        "reconcile-queue-stats": {
+            "task": "backend.celery_tasks.reconcile_queue_stats_task",
+            "schedule": 300.0,
+        },
         # Reset daily counters at midnight IST
         "reset-daily-counters-midnight": {
             "task": "backend.celery_tasks.reset_daily_counters",
@@ -34,30 +39,39 @@ celery_app.conf.update(
 )
 
 
+async def _ensure_redis() -> None:
+    """Celery workers don't run the FastAPI lifespan — connect Redis on first use."""
+    import redis_client
+    if redis_client.redis_client is None:
+        await redis_client.init_redis()
+
+
 @celery_app.task(name="backend.celery_tasks.recalculate_queue_task", bind=True, max_retries=3)
 def recalculate_queue_task(self):
     """
-    Recalculate all waiting patient priority scores in Redis.
-    Runs every 60 seconds via Celery beat.
+    Recalculate all waiting patient priority scores in Redis (live scoring mode only)
+    and re-broadcast so wait times are fresh. Runs every 60 seconds via Celery beat.
+    Emits reach browsers through the Socket.IO Redis message queue.
     This is a sync task that creates its own event loop.
     """
     import asyncio
     from database import AsyncSessionLocal
-    from queue_engine import recalculate_queue
-    from websocket_manager import broadcast_queue_updated
-    from doctor_engine import get_all_doctors, format_doctor_response
+    from queue_engine import recalculate_queue, invariant_scoring
+    from broadcast_coordinator import broadcast_if_changed
     from queue_engine import get_ordered_queue, get_queue_stats
 
     async def _run():
+        await _ensure_redis()
         async with AsyncSessionLocal() as db:
             try:
-                await recalculate_queue(db)
+                # Invariant keys never go stale; only live scores need rewriting
+                if not invariant_scoring():
+                    await recalculate_queue()
                 queue_data = await get_ordered_queue(db)
-                stats = await get_queue_stats(db)
-                doctors = await get_all_doctors(db)
-                doctor_data = [await format_doctor_response(d, db) for d in doctors]
-                await broadcast_queue_updated(queue_data, stats)
-                print(f"[Celery] Queue recalculated — {len(queue_data)} waiting patients")
+                stats = await get_queue_stats()
+                # Skipped when nothing but the clock moved since the last broadcast
+                emitted = await broadcast_if_changed(queue_data, stats)
+                print(f"[Celery] Queue recalculated — {len(queue_data)} waiting patients (emitted={emitted})")
             except Exception as exc:
                 print(f"[Celery] recalculate_queue_task error: {exc}")
                 raise self.retry(exc=exc, countdown=15)
@@ -70,19 +84,51 @@ def recalculate_queue_task(self):
     loop.run_until_complete(_run())
 
 
+@celery_app.task(name="backend.celery_tasks.reconcile_queue_stats_task", bind=True)
+def reconcile_queue_stats_task(self):
+    """
+    Recount live and today's status counters from Postgres and overwrite the
+    Redis copies the stats reads use. Runs every 5 minutes via Celery beat.
+    """
+    import asyncio
+    from database import AsyncSessionLocal
+    from queue_engine import reconcile_queue_stats
+
+    async def _run():
+        await _ensure_redis()
+        async with AsyncSessionLocal() as db:
+            try:
+                counts = await reconcile_queue_stats(db)
+                print(f"[Celery] Queue stats reconciled — {counts}")
+            except Exception as exc:
+                print(f"[Celery] reconcile_queue_stats_task error: {exc}")
+
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    loop.run_until_complete(_run())
+
+
 @celery_app.task(name="backend.celery_tasks.reset_daily_counters", bind=True)
 def reset_daily_counters(self):
     """
-    At midnight: reset token counter + doctor daily stats.
-    Patients from the previous day are NOT deleted — just stats reset.
+    At midnight: reset token counter + doctor daily stats, then move the previous
+    days' patients and event logs into patients_archive / event_logs_archive
+    (see archive.py — still readable through GET /patients/{id}, /staff/visits
+    and /staff/logs?day=).
     """
     import asyncio
     from database import AsyncSessionLocal
     from redis_client import reset_token_counter, clear_queue
-    from models import Doctor
+    from queue_engine import sync_doctor_state, reconcile_queue_stats
+    from archive import archive_past_visits
+    from models import Doctor, clinic_day
     from sqlalchemy import update
 
     async def _run():
+        await _ensure_redis()
         async with AsyncSessionLocal() as db:
             try:
                 # Reset all doctor daily counts
@@ -93,7 +139,11 @@ def reset_daily_counters(self):
                 # Reset Redis token counter and clear queue
                 await reset_token_counter()
                 await clear_queue()
-                print("[Celery] Daily counters reset successfully")
+                await sync_doctor_state(db)
+                # Move yesterday's visits and events out of the live tables
+                moved = await archive_past_visits(db, clinic_day())
+                await reconcile_queue_stats(db)
+                print(f"[Celery] Daily counters reset successfully (archived {moved})")
             except Exception as exc:
                 print(f"[Celery] reset_daily_counters error: {exc}")
                 await db.rollback()
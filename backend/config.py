@@ -24,7 +24,10 @@ def get_required_env(key: str) -> str:
 # 1. Strictly enforce required variables
 DATABASE_URL = get_required_env("DATABASE_URL")
 REDIS_URL = get_required_env("REDIS_URL")
-GROQ_API_KEY = get_required_env("GROQ_API_KEY")
+# Urgency engine: "groq" (model, local classifier as fallback) or "local" (offline only,
+# so no Groq key is needed)
+TRIAGE_ENGINE = os.getenv("TRIAGE_ENGINE", "groq").lower()
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "") if TRIAGE_ENGINE == "local" else get_required_env("GROQ_API_KEY")
 
 # Fix Render Postgres URL to use asyncpg
 if DATABASE_URL.startswith("postgres://"):
@@ -37,6 +40,33 @@ SECRET_KEY = os.getenv("SECRET_KEY", "placeholder_secret_key_for_dev_if_missing"
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "")
+# "invariant" stores a time-independent priority key in Redis; "live" stores the
+# wall-clock score and relies on the periodic Celery rescoring to keep it fresh.
+QUEUE_SCORING_MODE = os.getenv("QUEUE_SCORING_MODE", "invariant").lower()
+# Coalescing window for queue broadcasts: bursts of mutations emit at most once per window
+BROADCAST_WINDOW_MS = int(os.getenv("BROADCAST_WINDOW_MS", "250"))
+# Compress Engine.IO HTTP (polling) responses larger than this many bytes (Engine.IO default: 1024)
+WS_COMPRESSION_THRESHOLD = int(os.getenv("WS_COMPRESSION_THRESHOLD", "1024"))
+# Redis pub/sub used by Socket.IO to fan emits out across workers/processes ("" = in-process only)
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", REDIS_URL)
+# Number of queue entries pushed to the lobby display boards
+DISPLAY_TOP_N = int(os.getenv("DISPLAY_TOP_N", "12"))
+# Queue versions kept for resume-on-reconnect; clients further behind get a full snapshot
+REPLAY_LOG_SIZE = int(os.getenv("REPLAY_LOG_SIZE", "100"))
+# Local timezone of the clinic: where "today" starts for daily stats and resets
+CLINIC_TIMEZONE = os.getenv("CLINIC_TIMEZONE", "Asia/Kolkata")
+# "sync" waits for the AI urgency rating at registration; "async" registers with a
+# provisional urgency and re-scores the patient when the rating arrives
+TRIAGE_MODE = os.getenv("TRIAGE_MODE", "sync").lower()
+# Urgency ratings cached per normalised visit reason: in-process LRU size and shared TTL
+TRIAGE_CACHE_SIZE = int(os.getenv("TRIAGE_CACHE_SIZE", "1024"))
+TRIAGE_CACHE_TTL_SECONDS = int(os.getenv("TRIAGE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# How long registration waits for the model before the local classifier answers (0 = no limit)
+TRIAGE_LATENCY_BUDGET_MS = int(os.getenv("TRIAGE_LATENCY_BUDGET_MS", "1500"))
+# Concurrent urgency ratings are sent as one request: max reasons per batch and
+# how long the first reason waits for others (1 disables batching)
+TRIAGE_BATCH_SIZE = int(os.getenv("TRIAGE_BATCH_SIZE", "16"))
+TRIAGE_BATCH_WAIT_MS = int(os.getenv("TRIAGE_BATCH_WAIT_MS", "25"))
 
 class Settings:
     DATABASE_URL = DATABASE_URL
@@ -46,6 +76,20 @@ class Settings:
     CORS_ORIGINS = CORS_ORIGINS
     CELERY_BROKER_URL = CELERY_BROKER_URL
     CELERY_RESULT_BACKEND = CELERY_RESULT_BACKEND
+    QUEUE_SCORING_MODE = QUEUE_SCORING_MODE
+    BROADCAST_WINDOW_MS = BROADCAST_WINDOW_MS
+    WS_COMPRESSION_THRESHOLD = WS_COMPRESSION_THRESHOLD
+    SOCKETIO_MESSAGE_QUEUE = SOCKETIO_MESSAGE_QUEUE
+    DISPLAY_TOP_N = DISPLAY_TOP_N
+    REPLAY_LOG_SIZE = REPLAY_LOG_SIZE
+    CLINIC_TIMEZONE = CLINIC_TIMEZONE
+    TRIAGE_MODE = TRIAGE_MODE
+    TRIAGE_CACHE_SIZE = TRIAGE_CACHE_SIZE
+    TRIAGE_CACHE_TTL_SECONDS = TRIAGE_CACHE_TTL_SECONDS
+    TRIAGE_ENGINE = TRIAGE_ENGINE
+    TRIAGE_LATENCY_BUDGET_MS = TRIAGE_LATENCY_BUDGET_MS
+    TRIAGE_BATCH_SIZE = TRIAGE_BATCH_SIZE
+    TRIAGE_BATCH_WAIT_MS = TRIAGE_BATCH_WAIT_MS
     
     @property
     def cors_origins_list(self) -> list[str]:
@@ -0,0 +1,86 @@
+"""
+dashboard.py – One consistent snapshot of everything a dashboard screen shows
+
+The Postgres-backed parts (doctor roster, patients in consultation, recent events)
+are read in one REPEATABLE READ transaction. The waiting queue (Redis ZSET and
+projections) and the stats (Redis counters) are not in that transaction, so the
+whole read is fenced by the queue version: if a queue change bumps
+QUEUE_VERSION_KEY while the snapshot is being read, it is read again. A mutation
+that has committed but not yet bumped the version can still show on one side only.
+
+With the queue included, the snapshot also carries `version`: the last queue
+version broadcast over Socket.IO, read before the queue, so the queue returned
+is at least that new. A client adopts it as its delta base; later deltas from
+that version re-apply cleanly to the (possibly newer) state it holds.
+"""
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import EventLog
+from queue_engine import get_queue_view, get_queue_stats
+from doctor_engine import load_roster
+from redis_client import get_resource_version, QUEUE_VERSION_KEY
+from websocket_manager import current_queue_version
+
+# Reads of a dashboard snapshot before settling for one a queue change overlapped
+DASHBOARD_READ_ATTEMPTS = 3
+
+
+async def get_recent_events(db: AsyncSession, limit: int = 50) -> list[dict]:
+    """Most recent activity log entries, newest first."""
+    result = await db.execute(
+        select(EventLog)
+        .order_by(EventLog.timestamp.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "id": log.id,
+            "event_type": log.event_type,
+            "reference_id": log.reference_id,
+            "metadata": log.metadata_json,
+            "timestamp": log.timestamp.isoformat(),
+        }
+        for log in result.scalars().all()
+    ]
+
+
+async def build_dashboard(
+    db: AsyncSession,
+    include_queue: bool = True,
+    queue_limit: Optional[int] = None,
+    events_limit: int = 0,
+) -> dict:
+    """
+    Snapshot for a dashboard. Must be the first use of `db`: the isolation level
+    is set on the connection before any statement runs.
+    """
+    for _attempt in range(DASHBOARD_READ_ATTEMPTS):
+        version = await get_resource_version(QUEUE_VERSION_KEY)
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        snapshot = await _read_dashboard(db, include_queue, queue_limit, events_limit)
+        if await get_resource_version(QUEUE_VERSION_KEY) == version:
+            break
+        # The queue changed mid-read: start a fresh transaction and read again
+        await db.rollback()
+    return snapshot
+
+
+async def _read_dashboard(
+    db: AsyncSession,
+    include_queue: bool,
+    queue_limit: Optional[int],
+    events_limit: int,
+) -> dict:
+    snapshot: dict = {}
+    if include_queue:
+        snapshot["version"] = await current_queue_version()
+        snapshot["queue"] = await get_queue_view(db, limit=queue_limit)
+    # Straight from the transaction (not the roster cache) to stay in the same snapshot
+    snapshot["doctors"] = await load_roster(db)
+    snapshot["stats"] = await get_queue_stats()
+    if events_limit > 0:
+        snapshot["events"] = await get_recent_events(db, events_limit)
+    return snapshot
@@ -44,3 +44,36 @@ async def create_tables():
     async with engine.begin() as conn:
         import models  # noqa — ensure models are imported
         await conn.run_sync(Base.metadata.create_all)
+        await _upgrade_schema(conn)
+
+
+async def _upgrade_schema(conn) -> None:
+    """
+    Add columns and indexes introduced after a database was first created
+    (create_all never alters existing tables). Idempotent; Postgres only.
+    """
+    from sqlalchemy import text
+
+    if conn.dialect.name != "postgresql":
+        return
+    # patients.visit_date: backfill from created_at in the clinic's timezone
+    await conn.execute(text("ALTER TABLE patients ADD COLUMN IF NOT EXISTS visit_date DATE"))
+    await conn.execute(
+        text("UPDATE patients SET visit_date = (created_at AT TIME ZONE :tz)::date WHERE visit_date IS NULL"),
+        {"tz": settings.CLINIC_TIMEZONE},
+    )
+    await conn.execute(text("ALTER TABLE patients ALTER COLUMN visit_date SET NOT NULL"))
+
+    # Indexes that no longer serve any query (get_optimal_doctor reads the Redis
+    # availability index; the single-column status and event_type indexes already
+    # serve the in-consultation lookup and the no-show count)
+    for index_name in ("ix_doctors_available_load", "ix_patients_in_consultation", "ix_event_logs_type_timestamp"):
+        await conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+    # Indexes added to existing tables since they were created
+    def create_missing_indexes(sync_conn) -> None:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(create_missing_indexes)
@@ -1,14 +1,29 @@
 """
 doctor_engine.py – Doctor assignment and availability logic
 """
+import heapq
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 
-from sqlalchemy import select, func
+from sqlalchemy import case, select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from models import Doctor, Patient, PatientStatus
+from queue_engine import rescore_patients
+from redis_client import (
+    set_patient_doctor,
+    set_patients_doctors,
+    set_doctor_availability,
+    least_loaded_available_doctor,
+    claim_unassigned,
+    remove_from_queue,
+    get_resource_version,
+    ROSTER_VERSION_KEY,
+)
+
+# Process-wide roster cache: (roster version it was read at, roster rows)
+_roster_cache: Optional[Tuple[int, List[dict]]] = None
 
 
 async def get_all_doctors(db: AsyncSession) -> List[Doctor]:
@@ -29,24 +44,51 @@ async def get_doctor_by_id(db: AsyncSession, doctor_id: int) -> Optional[Doctor]
     return result.scalar_one_or_none()
 
 
+async def lock_patient(db: AsyncSession, patient_id: int) -> Optional[Patient]:
+    """
+    SELECT ... FOR UPDATE on one patient: the row, locked until the caller's
+    transaction ends, or None if it does not exist. A concurrent holder is
+    waited for, so the row returned reflects its committed changes.
+    """
+    result = await db.execute(
+        select(Patient)
+        .where(Patient.id == patient_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
 async def get_optimal_doctor(db: AsyncSession) -> Optional[Doctor]:
     """
     Return the best available doctor to assign a new patient to.
     Criteria:
       1. is_active = True, is_on_break = False, current_patient_id = NULL
       2. Among those, prefer the one with fewest total_consulted_today (most rested)
+    Picked from the Redis availability index in one call; the chosen row is then
+    loaded by primary key, and an index entry the database disagrees with is
+    corrected before trying the next one.
     """
-    result = await db.execute(
-        select(Doctor)
-        .where(
-            Doctor.is_active == True,
-            Doctor.is_on_break == False,
-            Doctor.current_patient_id == None,
-        )
-        .order_by(Doctor.total_consulted_today.asc())
-        .limit(1)
-    )
-    return result.scalar_one_or_none()
+    while True:
+        doctor_id = await least_loaded_available_doctor()
+        if doctor_id is None:
+            return None
+        doctor = await db.get(Doctor, doctor_id)
+        if doctor is not None and doctor.is_available:
+            return doctor
+        if doctor is None:
+            await set_doctor_availability(doctor_id, False, 0)
+        else:
+            await sync_doctor_availability(doctor)
+
+
+async def sync_doctor_availability(doctor: Doctor) -> None:
+    """
+    Write a doctor's current availability and load through to the Redis index.
+    Call it after the change is committed: the database is the source of truth,
+    and an entry written for a change that rolls back may never be corrected.
+    """
+    await set_doctor_availability(doctor.id, doctor.is_available, doctor.total_consulted_today)
 
 
 async def assign_doctor_to_patient(
@@ -68,7 +110,7 @@ async def start_consultation(
 ) -> None:
     """
     Mark the consultation as started.
-    Does NOT commit — caller is responsible.
+    Does NOT commit — the caller commits, then calls sync_doctor_availability().
     """
     doctor.current_patient_id = patient.id
     patient.status = PatientStatus.IN_CONSULTATION
@@ -82,7 +124,7 @@ async def complete_consultation(
 ) -> None:
     """
     Mark the consultation as complete.
-    Does NOT commit — caller is responsible.
+    Does NOT commit — the caller commits, then calls sync_doctor_availability().
     """
     patient.status = PatientStatus.COMPLETED
     patient.consultation_end = datetime.now(timezone.utc)
@@ -95,66 +137,145 @@ async def complete_consultation(
 async def auto_assign_next_patient(db: AsyncSession, doctor: Doctor) -> Optional[Patient]:
     """
     After a consultation ends, auto-assign the next highest-priority WAITING patient
-    that is not yet assigned to any doctor.
-    """
-    from redis_client import get_queue_ordered, remove_from_queue
+    that is not yet assigned to any doctor: one atomic pop from the Redis unassigned
+    index plus one conditional row update. Does NOT commit — caller is responsible.
 
-    ordered = await get_queue_ordered()
-    if not ordered:
-        return None
+    Safe under concurrency without a global lock: ZPOPMIN hands each caller a
+    distinct patient, and the UPDATE only matches a still-unassigned WAITING row,
+    so even a stale index entry cannot be assigned twice.
 
-    for pid_str, _score in ordered:
-        patient_id = int(pid_str)
-        result = await db.execute(
-            select(Patient).where(
-                Patient.id == patient_id,
-                Patient.status == PatientStatus.WAITING,
-                Patient.assigned_doctor_id == None,
+    Registration enqueues a patient before committing their row, so a popped id
+    with no visible row may belong to a registration still in flight: it is put
+    back in the index rather than dropped. Only entries whose row is confirmed to
+    be no longer WAITING are removed from the queue. Every patient left with a
+    new doctor is rescored, since the doctor-load term of their key changed.
+    """
+    not_yet_visible: List[int] = []
+    reassigned: List[int] = []
+    try:
+        while True:
+            patient_id = await claim_unassigned(doctor.id)
+            if patient_id is None:
+                return None
+
+            result = await db.execute(
+                update(Patient)
+                .where(
+                    Patient.id == patient_id,
+                    Patient.status == PatientStatus.WAITING,
+                    Patient.assigned_doctor_id == None,
+                )
+                .values(assigned_doctor_id=doctor.id)
+                .returning(Patient)
             )
-        )
-        patient = result.scalar_one_or_none()
-        if patient:
-            await assign_doctor_to_patient(db, patient, doctor)
-            return patient
+            patient = result.scalar_one_or_none()
+            if patient:
+                reassigned.append(patient_id)
+                return patient
 
-    return None
+            # Stale index entry: put Redis back in line with the row and try the next one
+            res = await db.execute(
+                select(Patient.status, Patient.assigned_doctor_id).where(Patient.id == patient_id)
+            )
+            row = res.one_or_none()
+            if row is None:
+                not_yet_visible.append(patient_id)
+            elif row.status == PatientStatus.WAITING:
+                await set_patient_doctor(patient_id, row.assigned_doctor_id)
+                reassigned.append(patient_id)
+            else:
+                await remove_from_queue(patient_id)
+    finally:
+        # Re-filed only now, so this call cannot pop them again
+        await set_patients_doctors({patient_id: None for patient_id in not_yet_visible})
+        await rescore_patients(reassigned)
 
 
 async def reassign_waiting_patients(db: AsyncSession, doctor_id: int) -> List[int]:
     """
-    When a doctor goes inactive, reassign all their WAITING patients.
+    When a doctor goes inactive, spread all their WAITING patients across the
+    remaining on-duty doctors in one batch pass (see plan_reassignment) and write
+    it with a single bulk UPDATE. Patients nobody can take become unassigned.
+    Does NOT commit — caller is responsible.
     Returns list of patient IDs that were reassigned.
     """
+    from redis_client import get_queue_ordered
+
     result = await db.execute(
-        select(Patient).where(
+        select(Patient.id).where(
             Patient.assigned_doctor_id == doctor_id,
             Patient.status == PatientStatus.WAITING,
         )
     )
-    patients = result.scalars().all()
+    orphaned = set(result.scalars().all())
+    if not orphaned:
+        return []
 
-    reassigned = []
-    for patient in patients:
-        other_doctor = await get_optimal_doctor(db)
-        if other_doctor:
-            patient.assigned_doctor_id = other_doctor.id
-        else:
-            patient.assigned_doctor_id = None
-        db.add(patient)
-        reassigned.append(patient.id)
+    # Highest priority first, so the best-placed doctors get the most urgent patients
+    rank = {int(pid): i for i, (pid, _score) in enumerate(await get_queue_ordered())}
+    ordered = sorted(orphaned, key=lambda pid: rank.get(pid, len(rank)))
 
-    return reassigned
+    doctors = await db.execute(
+        select(Doctor.id, Doctor.current_patient_id, Doctor.total_consulted_today).where(
+            Doctor.id != doctor_id,
+            Doctor.is_active == True,
+            Doctor.is_on_break == False,
+        )
+    )
+    doctors = doctors.all()
+    waiting_counts = await db.execute(
+        select(Patient.assigned_doctor_id, func.count(Patient.id))
+        .where(
+            Patient.status == PatientStatus.WAITING,
+            Patient.assigned_doctor_id.in_([d.id for d in doctors]),
+        )
+        .group_by(Patient.assigned_doctor_id)
+    )
+    plan = plan_reassignment(ordered, doctors, dict(waiting_counts.all()))
 
+    assigned = {pid: doc_id for pid, doc_id in plan.items() if doc_id is not None}
+    await db.execute(
+        update(Patient)
+        .where(Patient.id.in_(ordered))
+        .values(assigned_doctor_id=case(assigned, value=Patient.id, else_=None) if assigned else None)
+        .execution_options(synchronize_session=False)
+    )
+    await set_patients_doctors(plan)
+    await rescore_patients(ordered)
+    return ordered
 
-async def format_doctor_response(doctor: Doctor, db: AsyncSession) -> dict:
-    """Build a serialisable doctor dict for API responses and WebSocket broadcasts."""
-    current_token = None
-    if doctor.current_patient_id:
-        result = await db.execute(
-            select(Patient.token_number).where(Patient.id == doctor.current_patient_id)
-        )
-        current_token = result.scalar_one_or_none()
 
+def plan_reassignment(
+    patient_ids: List[int],
+    doctors: List,
+    waiting_counts: Dict[int, int],
+) -> Dict[int, Optional[int]]:
+    """
+    Assign `patient_ids` (highest priority first) to `doctors` — rows of
+    (id, current_patient_id, total_consulted_today) — with a min-heap keyed by
+    each doctor's outstanding work: patients already waiting for them plus the
+    one in the chair, then how many they have seen today. Every hand-out is
+    pushed back with its new load, so the batch spreads instead of piling onto
+    one doctor. Returns {patient_id: doctor_id or None}.
+    """
+    heap = [
+        (waiting_counts.get(d.id, 0) + (1 if d.current_patient_id else 0), d.total_consulted_today, d.id)
+        for d in doctors
+    ]
+    heapq.heapify(heap)
+
+    plan: Dict[int, Optional[int]] = {}
+    for patient_id in patient_ids:
+        if not heap:
+            plan[patient_id] = None
+            continue
+        outstanding, consulted, chosen = heapq.heappop(heap)
+        plan[patient_id] = chosen
+        heapq.heappush(heap, (outstanding + 1, consulted, chosen))
+    return plan
+
+
+def _doctor_row(doctor: Doctor, current_token: Optional[int]) -> dict:
     return {
         "id": doctor.id,
         "name": doctor.name,
@@ -166,3 +287,42 @@ async def format_doctor_response(doctor: Doctor, db: AsyncSession) -> dict:
         "current_patient_token": current_token,
         "total_consulted_today": doctor.total_consulted_today,
     }
+
+
+async def format_doctor_response(doctor: Doctor, db: AsyncSession) -> dict:
+    """
+    Build a serialisable doctor dict for API responses and WebSocket broadcasts.
+    Expects `current_patient` eager-loaded (get_doctor_by_id / get_all_doctors).
+    """
+    current = doctor.current_patient
+    return _doctor_row(doctor, current.token_number if current is not None else None)
+
+
+async def load_roster(db: AsyncSession) -> List[dict]:
+    """Every doctor with their current patient's token, in one joined query."""
+    result = await db.execute(
+        select(Doctor, Patient.token_number)
+        .outerjoin(Patient, Patient.id == Doctor.current_patient_id)
+        .order_by(Doctor.id)
+    )
+    return [_doctor_row(doctor, token) for doctor, token in result.all()]
+
+
+async def get_roster(db: AsyncSession, version: Optional[int] = None) -> List[dict]:
+    """
+    The doctor roster, served from a process-wide cache while the roster version
+    in Redis is unchanged — one Redis GET and no DB round trip in steady state.
+    Every doctor mutation bumps the version (mark_queue_dirty(roster_changed=True),
+    create_doctor, sync_doctor_state), which invalidates the cache in every
+    process. Pass `version` if the caller already read it. Treat the returned
+    list as read-only.
+    """
+    global _roster_cache
+    # Read the version first: rows loaded after it are at least that new
+    if version is None:
+        version = await get_resource_version(ROSTER_VERSION_KEY)
+    if _roster_cache is not None and _roster_cache[0] == version:
+        return _roster_cache[1]
+    roster = await load_roster(db)
+    _roster_cache = (version, roster)
+    return roster
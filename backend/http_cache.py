@@ -0,0 +1,48 @@
+"""
+http_cache.py – Conditional GET support for the polled read endpoints
+
+Validators are derived from Redis version counters that every mutation bumps, so
+an unchanged resource is answered with 304 from a single Redis GET — before any
+Postgres query runs.
+"""
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Browsers and the display boards may store responses but must revalidate each use
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(resource: str, version: int, *variant: object, weak: bool = False) -> str:
+    """Entity tag for one representation of `resource` at `version`."""
+    tag = "-".join(str(part) for part in (resource, version, *variant))
+    return f'W/"{tag}"' if weak else f'"{tag}"'
+
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match evaluation (weak comparison, as RFC 9110 requires for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = _opaque(etag)
+    return any(_opaque(candidate.strip()) == target for candidate in header.split(","))
+
+
+def set_validators(response: Response, etag: str, cache_control: str = CACHE_CONTROL) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+def not_modified(request: Request, etag: str, cache_control: str = CACHE_CONTROL) -> Optional[Response]:
+    """A 304 response if the client already holds `etag`, else None."""
+    if not etag_matches(request, etag):
+        return None
+    response = Response(status_code=304)
+    set_validators(response, etag, cache_control)
+    return response
@@ -26,6 +26,7 @@ from websocket_manager import sio
 from routes import patients as patients_router
 from routes import doctors as doctors_router
 from routes import staff as staff_router
+from routes import dashboard as dashboard_router
 
 
 @asynccontextmanager
@@ -61,6 +62,17 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"[MediQ] Seeding failed: {e}")
 
+    # 4. Mirror queue scoring state (patient fields, doctor loads) into Redis
+    try:
+        from database import AsyncSessionLocal
+        from queue_engine import sync_queue_from_db, reconcile_queue_stats
+        async with AsyncSessionLocal() as db:
+            synced = await sync_queue_from_db(db)
+            await reconcile_queue_stats(db)
+        logger.info(f"[MediQ] Queue state synced to Redis ({synced} waiting)")
+    except Exception as e:
+        logger.warning(f"[MediQ] Queue state sync failed: {e}")
+
     yield
 
     # ─── Shutdown ─────────────────────────────────────────────────────────────
@@ -108,6 +120,7 @@ app.add_middleware(
 app.include_router(patients_router.router, prefix="/api")
 app.include_router(doctors_router.router, prefix="/api")
 app.include_router(staff_router.router, prefix="/api")
+app.include_router(dashboard_router.router, prefix="/api")
 
 
 @app.get("/")
@@ -128,9 +141,13 @@ async def health():
     except Exception:
         redis_ok = False
 
+    from ml_engine.triage_cache import triage_cache
+    from ml_engine.groq_engine import urgency_batcher
     return {
         "status": "ok" if redis_ok else "degraded",
         "redis": "ok" if redis_ok else "error",
+        "triage_cache": triage_cache.stats(),
+        "triage_batches": urgency_batcher.stats() if urgency_batcher else None,
         "timestamp": datetime.now(timezone.utc).isoformat(),
     }
 
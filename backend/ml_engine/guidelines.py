@@ -0,0 +1,13 @@
+"""
+ml_engine/guidelines.py – Triage scoring guidelines
+
+Shared by the LLM prompts (groq_engine) and the local keyword classifier
+(local_triage), which learns its vocabulary from the examples below.
+"""
+
+SCORING_GUIDELINES = """STRICT SCORING GUIDELINES:
+1-2: Non-urgent / Routine (e.g., regular checkup, mild cold, runny nose, slight headache, prescription refill).
+3-4: Minor urgency (e.g., mild fever, sore throat, mild sprain, minor rash).
+5-6: Moderate (e.g., high fever that won't go down, deep cuts needing stitches, suspected isolated fractures).
+7-8: Urgent (e.g., severe abdominal pain, sudden extreme weakness, minor car accidents).
+9-10: Absolute Emergency / Life-Threatening (e.g., HEART ATTACK, severe chest pain, stroke symptoms, uncontrolled heavy bleeding, severe breathing difficulty, unconsciousness)."""
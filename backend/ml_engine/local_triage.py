@@ -0,0 +1,98 @@
+"""
+ml_engine/local_triage.py – Offline urgency classifier
+
+Keyword scoring learnt from the example phrases in SCORING_GUIDELINES: each
+example is a small document labelled with its band's upper score, words are
+weighted by inverse document frequency, and a reason takes the score of the
+example it covers best (ties go to the more urgent band). Pure Python, no
+I/O — it answers in microseconds, so it serves as the fallback when the model
+is slow or down and as the primary engine on offline deployments.
+"""
+import math
+import re
+from typing import Optional
+
+from ml_engine.guidelines import SCORING_GUIDELINES
+from ml_engine.triage_cache import normalize_reason
+
+DEFAULT_URGENCY = 5
+MIN_COVERAGE = 0.5  # Share of an example's (IDF-weighted) words a reason must contain
+
+_BAND_LINE = re.compile(r"^(\d+)-(\d+):.*\(e\.g\.,\s*(.+)\)\.?$")
+_DERIVATIONAL_SUFFIXES = ("ness", "ly")  # unconsciousness -> unconscious, heavily -> heavi
+_SUFFIXES = ("ing", "ed", "es", "e", "s")
+# Ways of saying a function is impaired, folded onto the guidelines' own word
+_DIFFICULTY = re.compile(r"\b(?:can t|cannot|can not|unable to|struggling to|trouble)\b")
+_STOPWORDS = {
+    "a", "an", "and", "am", "at", "for", "from", "go", "have", "has", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "since", "that", "the", "to", "very", "with",
+    "won", "t", "needing",
+}
+
+
+def _strip_suffix(word: str, suffixes: tuple[str, ...]) -> str:
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _stem(word: str) -> str:
+    """Crude stem shared by inflected and derived forms: "unconscious(ness)", "heavy/heavily"."""
+    word = _strip_suffix(_strip_suffix(word, _DERIVATIONAL_SUFFIXES), _SUFFIXES)
+    if word.endswith("y") and len(word) > 3:
+        word = word[:-1] + "i"
+    return word
+
+
+def _terms(text: str) -> set[str]:
+    text = _DIFFICULTY.sub("difficulty", normalize_reason(text))
+    return {_stem(word) for word in text.split() if word not in _STOPWORDS}
+
+
+def parse_guideline_examples(guidelines: str = SCORING_GUIDELINES) -> list[tuple[str, int]]:
+    """(example phrase, urgency) pairs; each band's examples get its upper score."""
+    examples = []
+    for line in guidelines.splitlines():
+        match = _BAND_LINE.match(line.strip())
+        if match:
+            _, high, phrases = match.groups()
+            examples.extend((phrase.strip(), int(high)) for phrase in phrases.split(",") if phrase.strip())
+    return examples
+
+
+class LocalTriageClassifier:
+    """IDF-weighted best-example match over the guideline examples."""
+
+    def __init__(self, examples: list[tuple[str, int]]):
+        self.examples = [(_terms(phrase), urgency) for phrase, urgency in examples]
+        self.examples = [(terms, urgency) for terms, urgency in self.examples if terms]
+        doc_freq: dict[str, int] = {}
+        for terms, _ in self.examples:
+            for term in terms:
+                doc_freq[term] = doc_freq.get(term, 0) + 1
+        total = len(self.examples)
+        self.idf = {term: math.log(1 + total / freq) for term, freq in doc_freq.items()}
+
+    def match(self, reason: str) -> Optional[int]:
+        """Urgency of the best-covered example, or None when nothing matches well enough."""
+        terms = _terms(reason)
+        best: Optional[tuple[float, int]] = None
+        for example_terms, urgency in self.examples:
+            weight = sum(self.idf[term] for term in example_terms)
+            coverage = sum(self.idf[term] for term in example_terms & terms) / weight
+            if coverage >= MIN_COVERAGE and (best is None or (coverage, urgency) > best):
+                best = (coverage, urgency)
+        return best[1] if best else None
+
+    def classify(self, reason: str) -> int:
+        urgency = self.match(reason)
+        return DEFAULT_URGENCY if urgency is None else urgency
+
+
+local_classifier = LocalTriageClassifier(parse_guideline_examples())
+
+
+def classify_urgency(reason: str) -> int:
+    """Local urgency rating 1-10; DEFAULT_URGENCY when no guideline example applies."""
+    return local_classifier.classify(reason)
@@ -0,0 +1,82 @@
+"""
+ml_engine/triage_batcher.py – Micro-batching of urgency ratings
+
+Reasons submitted within TRIAGE_BATCH_WAIT_MS of each other (up to
+TRIAGE_BATCH_SIZE of them) are rated in one model request, and each waiting
+coroutine gets its own item back. Identical reasons (after normalisation) in a
+batch are sent once. The rating function is injected, so any client works.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from ml_engine.triage_cache import normalize_reason
+
+logger = logging.getLogger(__name__)
+
+# reasons -> one rating per reason (None where the model gave nothing usable)
+RateBatch = Callable[[list[str]], Awaitable[list[Optional[int]]]]
+
+
+class UrgencyBatcher:
+    """Collects concurrent rating requests and flushes them as one batch."""
+
+    def __init__(self, rate_batch: RateBatch, max_batch: int, max_wait_seconds: float):
+        self.rate_batch = rate_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: dict[str, tuple[str, list[asyncio.Future]]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def rate(self, reason: str) -> Optional[int]:
+        """Rating for `reason` once its batch has been answered."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = normalize_reason(reason)
+        if key in self._pending:
+            self._pending[key][1].append(future)
+        else:
+            self._pending[key] = (reason, [future])
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._run(list(batch.values())))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: list[tuple[str, list[asyncio.Future]]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            ratings = await self.rate_batch([reason for reason, _ in batch])
+            if len(ratings) != len(batch):
+                raise ValueError(f"expected {len(batch)} ratings, got {len(ratings)}")
+        except Exception as exc:
+            logger.error(f"Batched urgency rating failed: {exc}")
+            ratings = [None] * len(batch)
+
+        for (_, futures), rating in zip(batch, ratings):
+            for future in futures:
+                if not future.done():
+                    future.set_result(rating)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
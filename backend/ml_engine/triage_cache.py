@@ -0,0 +1,95 @@
+"""
+ml_engine/triage_cache.py – Cache of urgency ratings keyed by normalised visit reason
+
+Two tiers: an in-process LRU (no I/O at all on a hit) in front of Redis, which
+shares ratings across workers and keeps them for TRIAGE_CACHE_TTL_SECONDS.
+Only ratings the model actually produced are cached — never the fallback.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TRIAGE_KEY_PREFIX = "mediq:triage:"   # String per normalised reason -> urgency (with TTL)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_reason(reason: str) -> str:
+    """Case-, punctuation- and spacing-insensitive form: "Fever / Cold" -> "fever cold"."""
+    return _NON_ALNUM.sub(" ", reason.lower()).strip()
+
+
+class TriageCache:
+    """In-process LRU backed by Redis, both expiring after `ttl_seconds`."""
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._local: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _redis_key(normalized: str) -> str:
+        return TRIAGE_KEY_PREFIX + hashlib.sha1(normalized.encode()).hexdigest()
+
+    def _remember(self, normalized: str, urgency: int) -> None:
+        self._local[normalized] = (urgency, time.monotonic() + self.ttl_seconds)
+        self._local.move_to_end(normalized)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    async def get(self, reason: str) -> Optional[int]:
+        normalized = normalize_reason(reason)
+        entry = self._local.get(normalized)
+        if entry is not None:
+            urgency, expires_at = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(normalized)
+                self.local_hits += 1
+                return urgency
+            del self._local[normalized]
+
+        try:
+            from redis_client import get_redis
+            cached = await get_redis().get(self._redis_key(normalized))
+        except Exception as exc:
+            logger.warning(f"Triage cache lookup in Redis failed: {exc}")
+            cached = None
+        if cached is not None:
+            self.redis_hits += 1
+            self._remember(normalized, int(cached))
+            return int(cached)
+
+        self.misses += 1
+        return None
+
+    async def set(self, reason: str, urgency: int) -> None:
+        normalized = normalize_reason(reason)
+        self._remember(normalized, urgency)
+        try:
+            from redis_client import get_redis
+            await get_redis().set(self._redis_key(normalized), urgency, ex=self.ttl_seconds)
+        except Exception as exc:
+            logger.warning(f"Triage cache write to Redis failed: {exc}")
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.redis_hits) / lookups, 3) if lookups else 0.0,
+            "local_entries": len(self._local),
+        }
+
+
+triage_cache = TriageCache(settings.TRIAGE_CACHE_SIZE, settings.TRIAGE_CACHE_TTL_SECONDS)
@@ -2,14 +2,17 @@
 models.py – SQLAlchemy ORM models for MediQ
 """
 import enum
-from datetime import datetime, timezone
+from datetime import date, datetime, time, timezone
 from typing import Optional, List
+from zoneinfo import ZoneInfo
 
 from sqlalchemy import (
     Boolean,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -17,6 +20,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from config import settings
 from database import Base
 
 
@@ -27,10 +31,25 @@ class PatientStatus(str, enum.Enum):
     NO_SHOW = "no_show"
 
 
-class Patient(Base):
-    __tablename__ = "patients"
+def clinic_day(now: Optional[datetime] = None) -> date:
+    """
+    The clinic-local calendar day `now` (default: current time) falls on — for a
+    new patient, their visit date.
+    """
+    return (now or datetime.now(timezone.utc)).astimezone(ZoneInfo(settings.CLINIC_TIMEZONE)).date()
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+
+def clinic_day_start(day: date) -> datetime:
+    """Clinic-local midnight at the start of `day`."""
+    return datetime.combine(day, time.min, tzinfo=ZoneInfo(settings.CLINIC_TIMEZONE))
+
+
+class PatientRecord:
+    """
+    Columns shared by the live `patients` table and `patients_archive`.
+    `patients` only holds today's visits (plus any consultation still running);
+    the nightly archive job moves finished days to `patients_archive`.
+    """
     token_number: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     phone: Mapped[str] = mapped_column(String(20), nullable=False)
@@ -39,9 +58,6 @@ class Patient(Base):
     status: Mapped[PatientStatus] = mapped_column(
         Enum(PatientStatus), nullable=False, default=PatientStatus.WAITING, index=True
     )
-    assigned_doctor_id: Mapped[Optional[int]] = mapped_column(
-        Integer, ForeignKey("doctors.id", ondelete="SET NULL"), nullable=True
-    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -51,6 +67,22 @@ class Patient(Base):
     consultation_end: Mapped[Optional[datetime]] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
+    visit_date: Mapped[date] = mapped_column(
+        Date, nullable=False, default=clinic_day, index=True
+    )
+
+
+class Patient(PatientRecord, Base):
+    __tablename__ = "patients"
+    __table_args__ = (
+        # Waiting patients per doctor (reassignment); see tests/test_query_plans.py
+        Index("ix_patients_status_doctor", "status", "assigned_doctor_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    assigned_doctor_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("doctors.id", ondelete="SET NULL"), nullable=True
+    )
 
     assigned_doctor: Mapped[Optional["Doctor"]] = relationship(
         "Doctor", foreign_keys=[assigned_doctor_id], back_populates="assigned_patients"
@@ -88,10 +120,23 @@ class Doctor(Base):
         return f"<Doctor {self.name} [active={self.is_active}]>"
 
 
-class EventLog(Base):
-    __tablename__ = "event_logs"
+class PatientArchive(PatientRecord, Base):
+    """Past visits moved out of `patients` by the nightly archive job."""
+    __tablename__ = "patients_archive"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    # No FK: archived visits outlive the doctor rows they point at
+    assigned_doctor_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<PatientArchive #{self.token_number} {self.name} [{self.visit_date}]>"
+
+
+class EventLogRecord:
+    """Columns shared by `event_logs` (today) and `event_logs_archive`."""
     event_type: Mapped[str] = mapped_column(String(80), nullable=False, index=True)
     reference_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     metadata_json: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -99,5 +144,24 @@ class EventLog(Base):
         DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
     )
 
+
+class EventLog(EventLogRecord, Base):
+    __tablename__ = "event_logs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+
     def __repr__(self) -> str:
         return f"<EventLog {self.event_type} @ {self.timestamp}>"
+
+
+class EventLogArchive(EventLogRecord, Base):
+    """Past days' events moved out of `event_logs` by the nightly archive job."""
+    __tablename__ = "event_logs_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<EventLogArchive {self.event_type} @ {self.timestamp}>"
@@ -2,6 +2,13 @@
 queue_engine.py – Priority queue engine using Redis ZSET
 Priority formula: score = (urgency * 0.6) + (wait_minutes * 0.3) + (doctor_load * 0.1)
 Stored as -score so ZRANGE (ascending) returns highest priority first.
+
+The wait term adds the same 0.3 * now to every waiting patient, so the relative
+order only depends on the time-invariant key
+    key = (urgency * 0.6) - (created_minutes * 0.3) + (doctor_load * 0.1)
+In "invariant" scoring mode that key is what lives in the ZSET and the displayed
+score is derived on read (score = key + 0.3 * now_minutes), so nothing has to be
+rewritten as time passes.
 """
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Tuple
@@ -10,10 +17,26 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from models import Patient, PatientStatus, Doctor
+from config import settings
+from models import Patient, PatientStatus, Doctor, EventLog, clinic_day, clinic_day_start
 from redis_client import (
-    add_to_queue,
+    QUEUE_VERSION_KEY,
+    ROSTER_VERSION_KEY,
+    bump_resource_versions,
+    record_status_transition,
+    get_status_counters,
+    replace_status_counters,
+    enqueue_patient,
+    register_in_queue,
+    rescore_queue,
+    shift_patient_urgency,
+    get_doctor_loads,
+    set_doctor_load,
+    replace_doctors,
+    get_queue_projections,
+    cache_patient_projections,
     remove_from_queue,
+    clear_unassigned,
     get_queue_ordered,
     get_queue_position,
     queue_length,
@@ -22,6 +45,26 @@ from redis_client import (
 # Average consultation time in minutes (used for wait time estimation)
 AVG_CONSULT_MINUTES = 12
 
+# Priority formula weights
+URGENCY_WEIGHT = 0.6
+WAIT_WEIGHT = 0.3
+LOAD_WEIGHT = 0.1
+
+
+def _as_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _epoch_minutes(dt: datetime) -> float:
+    return _as_utc(dt).timestamp() / 60.0
+
+
+def invariant_scoring() -> bool:
+    """True when the ZSET holds time-invariant priority keys instead of live scores."""
+    return settings.QUEUE_SCORING_MODE == "invariant"
+
 
 def compute_priority(
     urgency: int,
@@ -39,13 +82,54 @@ def compute_priority(
         doctor_load: inverse load factor (0.0 = high load, 1.0 = no load)
     """
     now = datetime.now(timezone.utc)
-    if created_at.tzinfo is None:
-        created_at = created_at.replace(tzinfo=timezone.utc)
-    wait_minutes = (now - created_at).total_seconds() / 60.0
-    score = (urgency * 0.6) + (wait_minutes * 0.3) + (doctor_load * 0.1)
+    wait_minutes = (now - _as_utc(created_at)).total_seconds() / 60.0
+    score = (urgency * URGENCY_WEIGHT) + (wait_minutes * WAIT_WEIGHT) + (doctor_load * LOAD_WEIGHT)
     return round(score, 4)
 
 
+def compute_priority_key(
+    urgency: int,
+    created_at: datetime,
+    doctor_load: float = 0.0,
+) -> float:
+    """
+    Time-invariant part of compute_priority().
+
+    Orders patients exactly like compute_priority() at any instant, but never
+    changes while the patient waits: compute_priority() == key + WAIT_WEIGHT * now_minutes.
+    """
+    key = (
+        (urgency * URGENCY_WEIGHT)
+        - (_epoch_minutes(created_at) * WAIT_WEIGHT)
+        + (doctor_load * LOAD_WEIGHT)
+    )
+    return round(key, 4)
+
+
+def score_from_key(key: float, now: Optional[datetime] = None) -> float:
+    """Turn a stored priority key into the displayed priority score at `now`."""
+    now = now or datetime.now(timezone.utc)
+    return round(key + _epoch_minutes(now) * WAIT_WEIGHT, 4)
+
+
+def compute_queue_value(
+    urgency: int,
+    created_at: datetime,
+    doctor_load: float = 0.0,
+) -> float:
+    """Value to store in the ZSET for the active scoring mode (positive, higher = first)."""
+    if invariant_scoring():
+        return compute_priority_key(urgency, created_at, doctor_load)
+    return compute_priority(urgency, created_at, doctor_load)
+
+
+def displayed_score(stored_value: float, now: Optional[datetime] = None) -> float:
+    """Convert a (positive) ZSET value back into the displayed priority score."""
+    if invariant_scoring():
+        return score_from_key(stored_value, now)
+    return stored_value
+
+
 def estimate_wait_time(queue_position: int, avg_consult: int = AVG_CONSULT_MINUTES) -> int:
     """
     Estimate wait time in minutes based on queue position.
@@ -56,11 +140,96 @@ def estimate_wait_time(queue_position: int, avg_consult: int = AVG_CONSULT_MINUT
     return max(1, (queue_position - 1) * avg_consult)
 
 
-async def add_patient_to_queue(patient: Patient, doctor_load: float = 0.0) -> float:
-    """Compute priority score and add patient to Redis ZSET."""
-    score = compute_priority(patient.urgency, patient.created_at, doctor_load)
-    await add_to_queue(patient.id, score)
-    return score
+def patient_projection(patient: Patient) -> Dict[str, str]:
+    """Display fields mirrored into the patient's Redis hash (see PATIENT_PROJECTION_FIELDS)."""
+    return {
+        "token_number": str(patient.token_number),
+        "name": patient.name,
+        "reason": patient.reason,
+        "urgency": str(patient.urgency),
+        "status": patient.status.value,
+        "doctor_id": str(patient.assigned_doctor_id) if patient.assigned_doctor_id else "",
+        "created_at": _as_utc(patient.created_at).isoformat(),
+    }
+
+
+def _scoring_fields(urgency: int, created_at: datetime) -> Dict[str, str]:
+    """Fields the server-side rescoring script reads (see RESCORE_QUEUE_LUA)."""
+    return {"score_urgency": str(urgency), "created_min": repr(_epoch_minutes(created_at))}
+
+
+async def doctor_load_term(doctor_id: Optional[int]) -> float:
+    """
+    Load factor for a patient of `doctor_id`, computed exactly as RESCORE_QUEUE_LUA
+    does from the mirrored loads: 1 - consulted / busiest doctor's consulted
+    (0.0 when unassigned or unknown), so keys written on enqueue and by the
+    server-side rescoring are comparable.
+    """
+    if not doctor_id:
+        return 0.0
+    loads = await get_doctor_loads()
+    consulted = loads.get(str(doctor_id))
+    if consulted is None:
+        return 0.0
+    return 1 - consulted / (max(loads.values()) or 1)
+
+
+async def add_patient_to_queue(patient: Patient, doctor_load: Optional[float] = None) -> float:
+    """
+    Compute priority score, add patient to Redis ZSET and write its projection through.
+    `doctor_load` defaults to the assigned doctor's current load term.
+    Returns the displayed score.
+    """
+    if doctor_load is None:
+        doctor_load = await doctor_load_term(patient.assigned_doctor_id)
+    value = compute_queue_value(patient.urgency, patient.created_at, doctor_load)
+    await enqueue_patient(
+        patient.id,
+        value,
+        {**patient_projection(patient), **_scoring_fields(patient.urgency, patient.created_at)},
+    )
+    return displayed_score(value)
+
+
+async def enqueue_new_patient(patient: Patient, doctor_load: Optional[float] = None) -> Tuple[int, int, int]:
+    """
+    Issue a token for a freshly inserted (flushed) patient and add it to the queue
+    in one Redis round trip. Returns (token_number, queue_position, queue_length).
+    """
+    if doctor_load is None:
+        doctor_load = await doctor_load_term(patient.assigned_doctor_id)
+    value = compute_queue_value(patient.urgency, patient.created_at, doctor_load)
+    fields = {**patient_projection(patient), **_scoring_fields(patient.urgency, patient.created_at)}
+    fields.pop("token_number")  # issued inside the script
+    return await register_in_queue(patient.id, value, fields)
+
+
+async def demote_patient_in_queue(patient: Patient) -> float:
+    """
+    Requeue a skipped patient below others of the same urgency.
+    Returns the displayed score after the demotion.
+    """
+    reduced_urgency = max(1, patient.urgency - 2)
+    now = datetime.now(timezone.utc)
+    # Restart the wait clock: below everyone of the reduced urgency who was
+    # already waiting, in either scoring mode
+    doctor_load = await doctor_load_term(patient.assigned_doctor_id)
+    new_score = compute_queue_value(reduced_urgency, now, doctor_load)
+
+    # The scoring fields carry the demotion and produce exactly this score, so
+    # server-side rescoring keeps it; the displayed urgency is left untouched
+    await enqueue_patient(patient.id, new_score, _scoring_fields(reduced_urgency, now))
+    return displayed_score(new_score)
+
+
+async def retriage_patient_in_queue(patient: Patient, previous_urgency: int) -> None:
+    """
+    Apply a late triage rating to a queued patient: the displayed urgency and the
+    urgency their key is scored with move by the same amount and the wait clock
+    is kept, so a skip demotion made in the meantime survives the new rating.
+    """
+    if await shift_patient_urgency(patient.id, patient.urgency, patient.urgency - previous_urgency):
+        await rescore_patients([patient.id])
 
 
 async def remove_patient_from_queue(patient_id: int) -> None:
@@ -68,112 +237,298 @@ async def remove_patient_from_queue(patient_id: int) -> None:
     await remove_from_queue(patient_id)
 
 
-async def get_ordered_queue(db: AsyncSession) -> List[dict]:
+def _queue_entry(fields: Dict[str, str], doctor_name: Optional[str], pos: int, score: float) -> dict:
+    doctor_id = fields["doctor_id"]
+    return {
+        "id": int(fields["id"]),
+        "token_number": int(fields["token_number"]),
+        "name": fields["name"],
+        "reason": fields["reason"],
+        "urgency": int(fields["urgency"]),
+        "status": fields["status"],
+        "assigned_doctor_id": int(doctor_id) if doctor_id else None,
+        "assigned_doctor_name": doctor_name,
+        "created_at": fields["created_at"],
+        "queue_position": pos,
+        "estimated_wait_minutes": estimate_wait_time(pos),
+        "priority_score": score,
+    }
+
+
+async def get_ordered_queue(
+    db: AsyncSession,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> List[dict]:
     """
-    Fetch the priority-ordered queue from Redis and join with DB for full patient data.
+    Fetch the priority-ordered queue from Redis with each patient's projection hash.
+    Postgres is only read for cache misses, which are then backfilled.
     Returns list of patient dicts enriched with position and estimated wait.
+
+    `offset`/`limit` select a window of the queue; positions and ETAs stay absolute
+    (the first row of a window at offset 20 is position 21).
     """
-    ordered = await get_queue_ordered()  # [(patient_id_str, neg_score), ...]
+    ordered = await get_queue_ordered(offset, limit)  # [(patient_id_str, neg_score), ...]
     if not ordered:
         return []
 
-    # Build id → position + score map
-    id_position: dict[int, tuple[int, float]] = {}
-    for rank, (pid_str, neg_score) in enumerate(ordered):
-        id_position[int(pid_str)] = (rank + 1, -neg_score)  # convert back to positive score
+    patient_ids = [int(pid_str) for pid_str, _score in ordered]
+    projections, doctor_names = await get_queue_projections(patient_ids)
+
+    # Cache misses (or a doctor we have no name for) → single batched DB query
+    missing = [
+        pid for pid, proj in zip(patient_ids, projections)
+        if proj is None or (proj["doctor_id"] and proj["doctor_id"] not in doctor_names)
+    ]
+    db_fields: Dict[int, Tuple[Dict[str, str], Optional[str]]] = {}
+    if missing:
+        result = await db.execute(
+            select(Patient)
+            .where(Patient.id.in_(missing))
+            .options(selectinload(Patient.assigned_doctor))
+        )
+        for patient in result.scalars().all():
+            doctor_name = patient.assigned_doctor.name if patient.assigned_doctor else None
+            db_fields[patient.id] = (patient_projection(patient), doctor_name)
+        await cache_patient_projections(
+            {pid: fields for pid, (fields, _name) in db_fields.items()}
+        )
+
+    now = datetime.now(timezone.utc)
+    queue_entries: list[dict] = []
+    for rank, ((pid_str, neg_score), pid, proj) in enumerate(zip(ordered, patient_ids, projections)):
+        if pid in db_fields:
+            fields, doctor_name = db_fields[pid]
+        elif proj is not None and pid not in missing:
+            fields = proj
+            doctor_name = doctor_names.get(proj["doctor_id"]) if proj["doctor_id"] else None
+        else:
+            continue  # Not in the DB either — stale ZSET member
+        pos = offset + rank + 1
+        queue_entries.append(
+            _queue_entry({**fields, "id": pid_str}, doctor_name, pos, displayed_score(-neg_score, now))
+        )
+
+    return queue_entries
 
-    patient_ids = list(id_position.keys())
 
-    # Single batched DB query
+async def get_queue_view(
+    db: AsyncSession, offset: int = 0, limit: Optional[int] = None
+) -> List[dict]:
+    """
+    The queue as the dashboards show it: get_ordered_queue() plus, on the first
+    page, the patients currently IN_CONSULTATION (not in the Redis ZSET).
+    """
+    ordered = await get_ordered_queue(db, offset=offset, limit=limit)
+    if offset > 0:
+        return ordered
+
     result = await db.execute(
         select(Patient)
-        .where(Patient.id.in_(patient_ids))
-        .options(selectinload(Patient.assigned_doctor))
+        .where(Patient.status == PatientStatus.IN_CONSULTATION)
     )
-    patients = result.scalars().all()
-
-    queue_entries: list[dict] = []
-    for patient in patients:
-        pos, score = id_position.get(patient.id, (999, 0.0))
-        wait = estimate_wait_time(pos)
-        queue_entries.append({
-            "id": patient.id,
-            "token_number": patient.token_number,
-            "name": patient.name,
-            "reason": patient.reason,
-            "urgency": patient.urgency,
-            "status": patient.status.value,
-            "assigned_doctor_id": patient.assigned_doctor_id,
-            "assigned_doctor_name": patient.assigned_doctor.name if patient.assigned_doctor else None,
-            "created_at": patient.created_at.isoformat(),
-            "queue_position": pos,
-            "estimated_wait_minutes": wait,
-            "priority_score": score,
+    consulting = result.scalars().all()
+
+    consulting_entries = []
+    for p in consulting:
+        doc_name = None
+        if p.assigned_doctor_id:
+            res = await db.execute(select(Doctor.name).where(Doctor.id == p.assigned_doctor_id))
+            doc_name = res.scalar_one_or_none()
+        consulting_entries.append({
+            "id": p.id,
+            "token_number": p.token_number,
+            "name": p.name,
+            "reason": p.reason,
+            "urgency": p.urgency,
+            "status": p.status.value,
+            "assigned_doctor_id": p.assigned_doctor_id,
+            "assigned_doctor_name": doc_name,
+            "created_at": p.created_at.isoformat(),
+            "queue_position": 0,
+            "estimated_wait_minutes": 0,
+            "priority_score": 0.0,
         })
 
-    # Sort by queue position
-    queue_entries.sort(key=lambda e: e["queue_position"])
-    return queue_entries
+    return ordered + consulting_entries
 
 
-async def recalculate_queue(db: AsyncSession) -> None:
+async def recalculate_queue() -> int:
     """
-    Recalculate priority scores for ALL waiting patients and update Redis ZSET.
-    Called after any event that changes priorities (emergency added, skip, etc.)
+    Recalculate priority scores for ALL waiting patients in one server-side script.
+    Uses the per-patient fields and doctor loads mirrored in Redis — no DB read.
+    Only needed in "live" scoring mode or to refresh the doctor-load term; in
+    "invariant" mode single-patient changes are applied with add_patient_to_queue().
+    Returns the number of patients re-scored.
     """
-    # Fetch all waiting patients
-    result = await db.execute(
-        select(Patient).where(Patient.status == PatientStatus.WAITING)
+    now = datetime.now(timezone.utc)
+    rescored = await rescore_queue(
+        settings.QUEUE_SCORING_MODE,
+        _epoch_minutes(now),
+        URGENCY_WEIGHT,
+        WAIT_WEIGHT,
+        LOAD_WEIGHT,
     )
-    waiting_patients = result.scalars().all()
-
-    # Fetch doctor loads: {doctor_id: patients_assigned_count}
-    doc_result = await db.execute(select(Doctor))
-    doctors = doc_result.scalars().all()
-
-    # Doctor load factor: fewer patients = higher load factor (i.e., more capacity)
-    # We use total_consulted_today as a proxy (more consulted = more experienced/available)
-    max_consulted = max((d.total_consulted_today for d in doctors), default=1) or 1
-
-    # Re-score each waiting patient
-    for patient in waiting_patients:
-        if patient.assigned_doctor_id:
-            # Find doctor's load factor: higher consulted = smaller load factor here
-            doctor = next((d for d in doctors if d.id == patient.assigned_doctor_id), None)
-            doctor_load = 1.0 - (doctor.total_consulted_today / max_consulted) if doctor else 0.0
-        else:
-            doctor_load = 0.0
+    await bump_resource_versions(QUEUE_VERSION_KEY)
+    return rescored
+
 
-        score = compute_priority(patient.urgency, patient.created_at, doctor_load)
-        await add_to_queue(patient.id, score)
+async def rescore_patients(patient_ids: List[int]) -> int:
+    """
+    Recompute the keys of patients whose assigned doctor changed (claim,
+    reassignment), whose doctor-load term moved with it. Invariant keys do not
+    depend on each other, so only these members are rescored; live scores all
+    share one "now", so in live mode the whole queue is.
+    Returns the number of patients re-scored.
+    """
+    if not patient_ids:
+        return 0
+    if not invariant_scoring():
+        return await recalculate_queue()
+    rescored = await rescore_queue(
+        settings.QUEUE_SCORING_MODE,
+        _epoch_minutes(datetime.now(timezone.utc)),
+        URGENCY_WEIGHT,
+        WAIT_WEIGHT,
+        LOAD_WEIGHT,
+        patient_ids,
+    )
+    await bump_resource_versions(QUEUE_VERSION_KEY)
+    return rescored
 
 
-async def get_queue_stats(db: AsyncSession) -> dict:
-    """Compute live stats for the queue."""
+async def update_doctor_load(doctor: Doctor) -> None:
+    """
+    Mirror a doctor's new total_consulted_today and rescore the queue: load terms
+    are relative to the busiest doctor, so one change can move every key's term.
+    """
+    await set_doctor_load(doctor.id, doctor.total_consulted_today)
+    await recalculate_queue()
+
+
+async def sync_doctor_state(db: AsyncSession) -> None:
+    """
+    Mirror every doctor's name and total_consulted_today into Redis, and rebuild
+    the availability index from the database (the source of truth).
+    """
+    result = await db.execute(select(Doctor))
+    doctors = result.scalars().all()
+    await replace_doctors(
+        {d.id: d.name for d in doctors},
+        {d.id: d.total_consulted_today for d in doctors},
+        available=[d.id for d in doctors if d.is_available],
+    )
+    await bump_resource_versions(QUEUE_VERSION_KEY, ROSTER_VERSION_KEY)
+
+
+async def sync_queue_from_db(db: AsyncSession) -> int:
+    """
+    Rebuild the Redis-side queue state (patient hashes, the unassigned index, doctor
+    names and loads) for the
+    patients currently in the ZSET from Postgres, then rescore. Run at startup so
+    server-side rescoring starts from the source of truth.
+    Returns the number of queued patients synced.
+    """
+    await sync_doctor_state(db)
+    # Re-enqueueing below refiles every waiting patient in the unassigned index
+    await clear_unassigned()
+
+    ordered = await get_queue_ordered()
+    patient_ids = [int(pid_str) for pid_str, _score in ordered]
+    if patient_ids:
+        result = await db.execute(
+            select(Patient).where(
+                Patient.id.in_(patient_ids),
+                Patient.status == PatientStatus.WAITING,
+            )
+        )
+        waiting = {p.id: p for p in result.scalars().all()}
+        for patient_id in patient_ids:
+            if patient_id in waiting:
+                await add_patient_to_queue(waiting[patient_id])
+            else:
+                # Finished or unknown patient left behind in Redis
+                await remove_from_queue(patient_id)
+    else:
+        waiting = {}
+
+    await recalculate_queue()
+    return len(waiting)
+
+
+async def record_status_change(old_status: Optional[PatientStatus], new_status: PatientStatus) -> None:
+    """
+    Count a committed patient status transition in today's stats.
+    Pass old_status=None for a new registration.
+    """
+    await record_status_transition(
+        clinic_day().isoformat(),
+        old_status.value if old_status is not None else None,
+        new_status.value,
+    )
+
+
+async def reconcile_queue_stats(db: AsyncSession) -> Dict[str, int]:
+    """
+    Recount the stats counters from Postgres and overwrite the Redis copies, to
+    repair any drift (missed or doubled transitions). Only touches live rows and
+    today's rows, never the whole history. Returns today's reconciled counters.
+    """
     from sqlalchemy import func as sqlfunc
-    from models import PatientStatus
 
-    # Count by status
-    result = await db.execute(
+    day = clinic_day()
+    start = clinic_day_start(day)
+
+    live_rows = await db.execute(
         select(Patient.status, sqlfunc.count(Patient.id))
+        .where(Patient.status.in_([PatientStatus.WAITING, PatientStatus.IN_CONSULTATION]))
         .group_by(Patient.status)
     )
-    counts = {row[0].value: row[1] for row in result}
+    live = {status.value: count for status, count in live_rows}
 
-    waiting = counts.get("waiting", 0)
-    in_consultation = counts.get("in_consultation", 0)
-    completed = counts.get("completed", 0)
-    no_show = counts.get("no_show", 0)
+    registered = await db.scalar(
+        select(sqlfunc.count(Patient.id)).where(Patient.visit_date == day)
+    )
+    completed = await db.scalar(
+        select(sqlfunc.count(Patient.id)).where(
+            Patient.status == PatientStatus.COMPLETED,
+            Patient.consultation_end >= start,
+        )
+    )
+    # No-shows carry no timestamp of their own; the event log records when they happened
+    no_show = await db.scalar(
+        select(sqlfunc.count(EventLog.id)).where(
+            EventLog.event_type == "patient_noshow",
+            EventLog.timestamp >= start,
+        )
+    )
+    daily = {
+        "registered": registered or 0,
+        PatientStatus.COMPLETED.value: completed or 0,
+        PatientStatus.NO_SHOW.value: no_show or 0,
+    }
+    await replace_status_counters(day.isoformat(), live, daily)
+    await bump_resource_versions(QUEUE_VERSION_KEY)
+    return {**live, **daily}
 
-    # Average wait time for waiting patients
+
+async def get_queue_stats() -> dict:
+    """
+    Live stats for the queue, read from the Redis status counters — O(1) however
+    much patient history the database holds. Counters are maintained by
+    record_status_change() and repaired by reconcile_queue_stats().
+    """
+    live, daily = await get_status_counters(clinic_day().isoformat())
     q_len = await queue_length()
+
+    # Average wait time for waiting patients
     avg_wait = estimate_wait_time(max(1, q_len // 2)) if q_len > 0 else 0
 
     return {
-        "in_queue": waiting,
-        "in_consultation": in_consultation,
-        "completed_today": completed,
-        "no_shows_today": no_show,
+        "in_queue": max(0, live.get("waiting", 0)),
+        "in_consultation": max(0, live.get("in_consultation", 0)),
+        "completed_today": daily.get("completed", 0),
+        "no_shows_today": daily.get("no_show", 0),
         "avg_wait_minutes": avg_wait,
-        "total_today": waiting + in_consultation + completed + no_show,
+        "total_today": daily.get("registered", 0),
     }
@@ -1,7 +1,7 @@
 """
 redis_client.py – Async Redis client and ZSET queue helpers
 """
-from typing import Optional, List, Tuple
+from typing import Any, Optional, List, Tuple, Dict
 import redis.asyncio as aioredis
 from config import settings
 
@@ -9,22 +9,227 @@ from config import settings
 redis_client: Optional[aioredis.Redis] = None
 
 QUEUE_KEY = "mediq:queue"           # Sorted set of patient IDs by priority score
+UNASSIGNED_KEY = "mediq:queue:unassigned"   # Subset of QUEUE_KEY with no doctor, same scores
 TOKEN_COUNTER_KEY = "mediq:token"   # Daily auto-incrementing token counter
+PATIENT_KEY_PREFIX = "mediq:patient:"   # Per-patient hash: queue display projection + scoring fields
+DOCTOR_LOAD_KEY = "mediq:doctor_load"   # Hash of doctor_id -> total_consulted_today
+DOCTOR_NAME_KEY = "mediq:doctor_name"   # Hash of doctor_id -> display name
+AVAILABLE_DOCTORS_KEY = "mediq:doctors:available"   # ZSET of available doctor_id by total_consulted_today
+QUEUE_VERSION_KEY = "mediq:version:queue"     # Bumped on every queue/stats mutation (HTTP validators)
+ROSTER_VERSION_KEY = "mediq:version:roster"   # Bumped on every doctor roster mutation
+STATS_LIVE_KEY = "mediq:stats:live"           # Hash of live status -> current patient count
+STATS_DAY_KEY_PREFIX = "mediq:stats:day:"     # Per-day hash: registered / completed / no_show counts
+STATS_DAY_TTL_SECONDS = 8 * 24 * 3600         # Keep a week of daily counters
+
+# Statuses counted as a current gauge; all others are counted per day as they happen
+LIVE_STATUSES = ("waiting", "in_consultation")
+
+# Display fields kept in each queued patient's hash (everything a queue entry shows)
+PATIENT_PROJECTION_FIELDS = (
+    "token_number", "name", "reason", "urgency", "status", "doctor_id", "created_at",
+)
+
+# Rescore every queued patient from its hash + the doctor load hash, atomically.
+# KEYS[1] = queue ZSET, KEYS[2] = doctor load hash, KEYS[3] = unassigned ZSET
+# ARGV    = patient key prefix, mode ("invariant" | "live"), now_minutes,
+#           urgency weight, wait weight, load weight, then optionally the patient
+#           ids to rescore (default every member; ids no longer queued are skipped)
+RESCORE_QUEUE_LUA = """
+local loads = redis.call('HGETALL', KEYS[2])
+local load_by_doctor = {}
+local max_consulted = 0
+for i = 1, #loads, 2 do
+    local consulted = tonumber(loads[i + 1]) or 0
+    load_by_doctor[loads[i]] = consulted
+    if consulted > max_consulted then max_consulted = consulted end
+end
+if max_consulted == 0 then max_consulted = 1 end
+
+local prefix, mode, now = ARGV[1], ARGV[2], tonumber(ARGV[3])
+local w_urgency, w_wait, w_load = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6])
+
+local members = redis.call('ZRANGE', KEYS[1], 0, -1)
+if #ARGV > 6 then
+    members = {}
+    for i = 7, #ARGV do
+        if redis.call('ZSCORE', KEYS[1], ARGV[i]) then members[#members + 1] = ARGV[i] end
+    end
+end
+local zadd_args = {}
+for _, pid in ipairs(members) do
+    local meta = redis.call('HMGET', prefix .. pid, 'score_urgency', 'created_min', 'doctor_id')
+    local urgency, created = tonumber(meta[1]), tonumber(meta[2])
+    if urgency and created then
+        local doctor_load = 0
+        local consulted = meta[3] and load_by_doctor[meta[3]]
+        if consulted then doctor_load = 1 - consulted / max_consulted end
+        local score = urgency * w_urgency + doctor_load * w_load
+        if mode == 'invariant' then
+            score = score - created * w_wait
+        else
+            score = score + (now - created) * w_wait
+        end
+        score = math.floor(score * 10000 + 0.5) / 10000
+        zadd_args[#zadd_args + 1] = -score
+        zadd_args[#zadd_args + 1] = pid
+    end
+end
+-- ZADD in chunks so unpack() stays under Lua's stack limit; the unassigned
+-- index mirrors the new scores of the members it already holds (XX)
+for i = 1, #zadd_args, 2000 do
+    local last = math.min(i + 1999, #zadd_args)
+    redis.call('ZADD', KEYS[1], unpack(zadd_args, i, last))
+    redis.call('ZADD', KEYS[3], 'XX', unpack(zadd_args, i, last))
+end
+return #zadd_args / 2
+"""
+
+# Keep the unassigned index in step with the patient hash's doctor_id.
+# Expects KEYS[2] = queue ZSET, KEYS[3] = patient hash, KEYS[4] = unassigned ZSET,
+# ARGV[1] = patient_id, ARGV[2] = -priority_score.
+_SYNC_UNASSIGNED_LUA = """
+local doctor = redis.call('HGET', KEYS[3], 'doctor_id')
+if doctor and doctor ~= '' then
+    redis.call('ZREM', KEYS[4], ARGV[1])
+else
+    redis.call('ZADD', KEYS[4], ARGV[2], ARGV[1])
+end
+"""
+
+# Issue a token and enqueue a new patient in one atomic step.
+# KEYS[1] = token counter, KEYS[2] = queue ZSET, KEYS[3] = patient hash,
+# KEYS[4] = unassigned ZSET
+# ARGV    = patient_id, -priority_score, then field/value pairs for the patient hash
+# Returns {token, rank (0-based), queue length}
+REGISTER_PATIENT_LUA = """
+local token = redis.call('INCR', KEYS[1])
+local fields = {'token_number', token}
+for i = 3, #ARGV do fields[#fields + 1] = ARGV[i] end
+redis.call('HSET', KEYS[3], unpack(fields))
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+""" + _SYNC_UNASSIGNED_LUA + """
+local rank = redis.call('ZRANK', KEYS[2], ARGV[1])
+local length = redis.call('ZCARD', KEYS[2])
+return {token, rank, length}
+"""
+
+# Add/update a queued patient and write fields through to its hash.
+# KEYS[1] unused (keeps the KEYS layout of REGISTER_PATIENT_LUA), KEYS[2] = queue ZSET,
+# KEYS[3] = patient hash, KEYS[4] = unassigned ZSET
+# ARGV    = patient_id, -priority_score, then field/value pairs for the patient hash
+ENQUEUE_PATIENT_LUA = """
+if #ARGV > 2 then redis.call('HSET', KEYS[3], unpack(ARGV, 3)) end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+""" + _SYNC_UNASSIGNED_LUA
+
+# Set (or clear, with '') a queued patient's doctor and update the unassigned index.
+# KEYS[2] = queue ZSET, KEYS[3] = patient hash, KEYS[4] = unassigned ZSET
+# ARGV    = patient_id, doctor_id or ''
+SET_PATIENT_DOCTOR_LUA = """
+redis.call('HSET', KEYS[3], 'doctor_id', ARGV[2])
+local score = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if ARGV[2] == '' and score then
+    redis.call('ZADD', KEYS[4], score, ARGV[1])
+else
+    redis.call('ZREM', KEYS[4], ARGV[1])
+end
+"""
+
+# Pop the highest-priority unassigned patient and record the claiming doctor.
+# KEYS[1] = unassigned ZSET; ARGV = patient key prefix, doctor_id
+# Returns the patient id, or false if nobody is unassigned
+CLAIM_UNASSIGNED_LUA = """
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then return false end
+redis.call('HSET', ARGV[1] .. popped[1], 'doctor_id', ARGV[2])
+return popped[1]
+"""
+
+# Move a queued patient's urgency by a delta: the displayed value is set, the scoring
+# urgency shifted (so a demotion's offset and restarted wait clock are kept).
+# KEYS[1] = queue ZSET, KEYS[2] = patient hash; ARGV = patient_id, urgency, delta
+# Returns 1 if the patient is queued (and was updated), 0 otherwise
+SHIFT_URGENCY_LUA = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then return 0 end
+redis.call('HSET', KEYS[2], 'urgency', ARGV[2])
+local scored = tonumber(redis.call('HGET', KEYS[2], 'score_urgency'))
+if scored then
+    redis.call('HSET', KEYS[2], 'score_urgency', math.max(1, scored + tonumber(ARGV[3])))
+end
+return 1
+"""
+
+REDIS_POOL_TIMEOUT_SECONDS = 5   # Longest a command waits for a pooled connection
+
+# Stamp a JSON snapshot with the next version and make it the current one, in one step,
+# so versions are handed out in the order snapshots are stored.
+# KEYS[1] = version counter, KEYS[2] = current snapshot, KEYS[3] = history hash (version -> snapshot)
+# ARGV    = snapshot JSON object without "version", replay log size
+# Returns {version, previous snapshot JSON or false}
+SWAP_SNAPSHOT_LUA = """
+local version = redis.call('INCR', KEYS[1])
+local raw = '{"version": ' .. version .. ', ' .. string.sub(ARGV[1], 2)
+local prev = redis.call('GET', KEYS[2])
+redis.call('SET', KEYS[2], raw)
+redis.call('HSET', KEYS[3], version, raw)
+redis.call('HDEL', KEYS[3], version - tonumber(ARGV[2]))
+return {version, prev}
+"""
+
+_rescore_script = None
+_register_script = None
+_enqueue_script = None
+_set_doctor_script = None
+_claim_script = None
+_shift_urgency_script = None
+_swap_snapshot_script = None
 
 
 async def init_redis() -> aioredis.Redis:
     """Connect to Redis and return the client."""
     global redis_client
-    redis_client = aioredis.from_url(
+    # A blocking pool makes a burst of requests queue for a free connection
+    # instead of failing with "Too many connections"
+    pool = aioredis.BlockingConnectionPool.from_url(
         settings.REDIS_URL,
         encoding="utf-8",
         decode_responses=True,
         max_connections=20,
+        timeout=REDIS_POOL_TIMEOUT_SECONDS,
     )
+    redis_client = aioredis.Redis.from_pool(pool)
     await redis_client.ping()
+    _register_scripts(redis_client)
+    await _seed_resource_versions(redis_client)
     return redis_client
 
 
+def _register_scripts(r: aioredis.Redis) -> None:
+    """Register Lua scripts (called via EVALSHA, falling back to EVAL on NOSCRIPT)."""
+    global _rescore_script, _register_script, _enqueue_script, _set_doctor_script, _claim_script
+    global _shift_urgency_script, _swap_snapshot_script
+    _rescore_script = r.register_script(RESCORE_QUEUE_LUA)
+    _register_script = r.register_script(REGISTER_PATIENT_LUA)
+    _enqueue_script = r.register_script(ENQUEUE_PATIENT_LUA)
+    _set_doctor_script = r.register_script(SET_PATIENT_DOCTOR_LUA)
+    _claim_script = r.register_script(CLAIM_UNASSIGNED_LUA)
+    _shift_urgency_script = r.register_script(SHIFT_URGENCY_LUA)
+    _swap_snapshot_script = r.register_script(SWAP_SNAPSHOT_LUA)
+
+
+async def _seed_resource_versions(r: aioredis.Redis) -> None:
+    """
+    Start missing version counters at the current epoch millisecond, so a flushed
+    Redis never hands out a version (and thus an ETag) a client already cached.
+    """
+    import time
+    now_ms = int(time.time() * 1000)
+    async with r.pipeline(transaction=False) as pipe:
+        for key in (QUEUE_VERSION_KEY, ROSTER_VERSION_KEY):
+            pipe.set(key, now_ms, nx=True)
+        await pipe.execute()
+
+
 async def close_redis():
     global redis_client
     if redis_client:
@@ -41,29 +246,175 @@ def get_redis() -> aioredis.Redis:
 
 # ─────────────────────── Priority Queue Operations ────────────────────────────
 
+def _patient_keys(patient_id: int) -> List[str]:
+    """KEYS layout shared by the enqueue-family scripts."""
+    return [TOKEN_COUNTER_KEY, QUEUE_KEY, PATIENT_KEY_PREFIX + str(patient_id), UNASSIGNED_KEY]
+
+
 async def add_to_queue(patient_id: int, priority_score: float) -> None:
     """
     Add/update a patient in the Redis sorted set.
     We store -priority_score so that ZRANGE (ascending) returns highest priority first.
     """
     r = get_redis()
-    await r.zadd(QUEUE_KEY, {str(patient_id): -priority_score})
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.zadd(QUEUE_KEY, {str(patient_id): -priority_score})
+        pipe.zadd(UNASSIGNED_KEY, {str(patient_id): -priority_score}, xx=True)
+        await pipe.execute()
+
+
+async def enqueue_patient(patient_id: int, priority_score: float, fields: Dict[str, Any]) -> None:
+    """
+    Add/update a patient in the ZSET and write `fields` through to its hash
+    (projection and/or scoring fields), in one scripted round trip that also
+    files the patient in or out of the unassigned index.
+    """
+    if _enqueue_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    await _enqueue_script(
+        keys=_patient_keys(patient_id),
+        args=[str(patient_id), repr(-priority_score), *[x for kv in fields.items() for x in kv]],
+    )
+
+
+async def register_in_queue(
+    patient_id: int,
+    priority_score: float,
+    fields: Dict[str, Any],
+) -> Tuple[int, int, int]:
+    """
+    Issue the next token, enqueue the patient and read back its position in a
+    single scripted call. Because the script runs atomically, no concurrent insert
+    can shift the rank between the ZADD and the ZRANK.
+    Returns (token_number, 1-based position, queue length).
+    """
+    if _register_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    token, rank, length = await _register_script(
+        keys=_patient_keys(patient_id),
+        args=[str(patient_id), repr(-priority_score), *[x for kv in fields.items() for x in kv]],
+    )
+    return int(token), int(rank) + 1, int(length)
+
+
+async def set_patient_doctor(patient_id: int, doctor_id: Optional[int]) -> None:
+    """
+    Record a queued patient's assigned doctor (feeds the doctor-load term) and
+    move them out of — or, with None, into — the unassigned index.
+    """
+    if _set_doctor_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    await _set_doctor_script(
+        keys=_patient_keys(patient_id),
+        args=[str(patient_id), str(doctor_id) if doctor_id is not None else ""],
+    )
+
+
+async def set_patients_doctors(assignments: Dict[int, Optional[int]]) -> None:
+    """set_patient_doctor() for many patients, pipelined into one round trip."""
+    if not assignments:
+        return
+    if _set_doctor_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for patient_id, doctor_id in assignments.items():
+            await _set_doctor_script(
+                keys=_patient_keys(patient_id),
+                args=[str(patient_id), str(doctor_id) if doctor_id is not None else ""],
+                client=pipe,
+            )
+        await pipe.execute()
+
+
+async def claim_unassigned(doctor_id: int) -> Optional[int]:
+    """
+    Atomically pop the highest-priority unassigned waiting patient and mark them
+    as `doctor_id`'s in Redis. Returns the patient id, or None if there is none.
+    The caller must confirm the claim in the database.
+    """
+    if _claim_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    patient_id = await _claim_script(keys=[UNASSIGNED_KEY], args=[PATIENT_KEY_PREFIX, str(doctor_id)])
+    return int(patient_id) if patient_id else None
+
+
+async def shift_patient_urgency(patient_id: int, urgency: int, delta: int) -> bool:
+    """
+    Set a queued patient's displayed urgency and shift the urgency their key is
+    scored with by `delta`, leaving the wait clock alone. The caller rescores.
+    Returns False (and changes nothing) if the patient is not queued.
+    """
+    if _shift_urgency_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    shifted = await _shift_urgency_script(
+        keys=[QUEUE_KEY, PATIENT_KEY_PREFIX + str(patient_id)],
+        args=[str(patient_id), str(urgency), str(delta)],
+    )
+    return bool(shifted)
+
+
+async def clear_unassigned() -> None:
+    """Drop the unassigned index (rebuilt by re-enqueueing; see sync_queue_from_db)."""
+    await get_redis().delete(UNASSIGNED_KEY)
 
 
 async def remove_from_queue(patient_id: int) -> None:
     r = get_redis()
-    await r.zrem(QUEUE_KEY, str(patient_id))
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.zrem(QUEUE_KEY, str(patient_id))
+        pipe.zrem(UNASSIGNED_KEY, str(patient_id))
+        pipe.delete(PATIENT_KEY_PREFIX + str(patient_id))
+        await pipe.execute()
 
 
-async def get_queue_ordered() -> List[Tuple[str, float]]:
+async def get_queue_ordered(offset: int = 0, limit: Optional[int] = None) -> List[Tuple[str, float]]:
     """
     Return list of (patient_id_str, negative_score) ordered by priority (highest first).
+    With `limit`, only the window [offset, offset + limit) is fetched, so the cost
+    grows with the page size rather than the queue length.
     """
     r = get_redis()
-    result = await r.zrange(QUEUE_KEY, 0, -1, withscores=True)
+    stop = -1 if limit is None else offset + limit - 1
+    result = await r.zrange(QUEUE_KEY, offset, stop, withscores=True)
     return result
 
 
+async def get_queue_projections(
+    patient_ids: List[int],
+) -> Tuple[List[Optional[Dict[str, str]]], Dict[str, str]]:
+    """
+    Pipelined HMGET of the display projection for each patient, plus the doctor
+    name map, in one round trip. A None entry means the projection is missing
+    (cache miss) and the caller should fall back to the database.
+    """
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        for pid in patient_ids:
+            pipe.hmget(PATIENT_KEY_PREFIX + str(pid), PATIENT_PROJECTION_FIELDS)
+        pipe.hgetall(DOCTOR_NAME_KEY)
+        results = await pipe.execute()
+
+    doctor_names = results.pop()
+    projections: List[Optional[Dict[str, str]]] = []
+    for values in results:
+        if values[0] is None:
+            projections.append(None)
+        else:
+            projections.append(dict(zip(PATIENT_PROJECTION_FIELDS, values)))
+    return projections, doctor_names
+
+
+async def cache_patient_projections(projections: Dict[int, Dict[str, Any]]) -> None:
+    """Backfill projection hashes after a cache miss was served from the database."""
+    if not projections:
+        return
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        for pid, fields in projections.items():
+            pipe.hset(PATIENT_KEY_PREFIX + str(pid), mapping=fields)
+        await pipe.execute()
+
+
 async def get_queue_position(patient_id: int) -> int:
     """Return 1-based position of the patient in the priority queue."""
     r = get_redis()
@@ -83,6 +434,98 @@ async def queue_length() -> int:
     return await r.zcard(QUEUE_KEY)
 
 
+async def rescore_queue(
+    mode: str,
+    now_minutes: float,
+    urgency_weight: float,
+    wait_weight: float,
+    load_weight: float,
+    patient_ids: Optional[List[int]] = None,
+) -> int:
+    """
+    Rescore the whole ZSET — or just `patient_ids` — server-side in a single EVALSHA.
+    The script runs atomically, so readers never see a half-rescored queue.
+    Returns the number of patients re-scored.
+    """
+    if _rescore_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    return await _rescore_script(
+        keys=[QUEUE_KEY, DOCTOR_LOAD_KEY, UNASSIGNED_KEY],
+        args=[
+            PATIENT_KEY_PREFIX, mode, repr(now_minutes), urgency_weight, wait_weight, load_weight,
+            *[str(pid) for pid in patient_ids or []],
+        ],
+    )
+
+
+# ────────────────────────── Doctor Load Helpers ───────────────────────────────
+
+async def set_doctor_load(doctor_id: int, total_consulted: int) -> None:
+    r = get_redis()
+    await r.hset(DOCTOR_LOAD_KEY, str(doctor_id), total_consulted)
+
+
+async def get_doctor_loads() -> Dict[str, int]:
+    """doctor_id (str) -> total_consulted_today, as mirrored for the rescoring script."""
+    r = get_redis()
+    loads = await r.hgetall(DOCTOR_LOAD_KEY)
+    return {doctor_id: int(consulted) for doctor_id, consulted in loads.items()}
+
+
+async def get_doctor_ids() -> List[int]:
+    """Ids of every doctor mirrored into Redis (the roster, active or not)."""
+    r = get_redis()
+    return [int(doctor_id) for doctor_id in await r.hkeys(DOCTOR_NAME_KEY)]
+
+
+async def set_doctor(doctor_id: int, name: str, total_consulted: int) -> None:
+    """Record a doctor's display name and load (new doctor / rename)."""
+    r = get_redis()
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.hset(DOCTOR_NAME_KEY, str(doctor_id), name)
+        pipe.hset(DOCTOR_LOAD_KEY, str(doctor_id), total_consulted)
+        await pipe.execute()
+
+
+async def replace_doctors(
+    names: Dict[int, str],
+    loads: Dict[int, int],
+    available: Optional[List[int]] = None,
+) -> None:
+    """
+    Overwrite the doctor name and load hashes — and, if `available` is given, the
+    availability index — from the database.
+    """
+    r = get_redis()
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.delete(DOCTOR_NAME_KEY, DOCTOR_LOAD_KEY)
+        if names:
+            pipe.hset(DOCTOR_NAME_KEY, mapping={str(k): v for k, v in names.items()})
+        if loads:
+            pipe.hset(DOCTOR_LOAD_KEY, mapping={str(k): v for k, v in loads.items()})
+        if available is not None:
+            pipe.delete(AVAILABLE_DOCTORS_KEY)
+            if available:
+                pipe.zadd(AVAILABLE_DOCTORS_KEY, {str(k): loads.get(k, 0) for k in available})
+        await pipe.execute()
+
+
+async def set_doctor_availability(doctor_id: int, available: bool, total_consulted: int) -> None:
+    """Write one doctor's availability (scored by load) through to the index."""
+    r = get_redis()
+    if available:
+        await r.zadd(AVAILABLE_DOCTORS_KEY, {str(doctor_id): total_consulted})
+    else:
+        await r.zrem(AVAILABLE_DOCTORS_KEY, str(doctor_id))
+
+
+async def least_loaded_available_doctor() -> Optional[int]:
+    """The available doctor with the fewest consultations today (O(log n)), or None."""
+    r = get_redis()
+    head = await r.zrange(AVAILABLE_DOCTORS_KEY, 0, 0)
+    return int(head[0]) if head else None
+
+
 # ────────────────────────── Token Counter Helpers ─────────────────────────────
 
 async def get_next_token() -> int:
@@ -99,6 +542,89 @@ async def reset_token_counter() -> None:
 
 
 async def clear_queue() -> None:
-    """Clear the entire queue (used for daily reset)."""
+    """Clear the entire queue and its per-patient hashes (used for daily reset)."""
+    r = get_redis()
+    members = await r.zrange(QUEUE_KEY, 0, -1)
+    await r.delete(QUEUE_KEY, UNASSIGNED_KEY, *[PATIENT_KEY_PREFIX + pid for pid in members])
+
+
+async def bump_resource_versions(*keys: str) -> None:
+    """Invalidate cached representations of the given resources (version keys)."""
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.incr(key)
+        await pipe.execute()
+
+
+async def swap_versioned_snapshot(
+    version_key: str,
+    snapshot_key: str,
+    history_key: str,
+    snapshot_json: str,
+    history_size: int,
+) -> Tuple[int, Optional[str]]:
+    """
+    Store `snapshot_json` (a non-empty JSON object) as the current snapshot under
+    the next version, record it in the bounded history, and return
+    (version, previous snapshot JSON or None) — atomically.
+    """
+    if _swap_snapshot_script is None:
+        raise RuntimeError("Redis is not initialised. Call init_redis() first.")
+    version, prev = await _swap_snapshot_script(
+        keys=[version_key, snapshot_key, history_key],
+        args=[snapshot_json, history_size],
+    )
+    return int(version), prev or None
+
+
+async def get_resource_version(key: str) -> int:
+    """Current version of a resource (0 if never seeded)."""
+    return int(await get_redis().get(key) or 0)
+
+
+async def record_status_transition(day: str, old_status: Optional[str], new_status: str) -> None:
+    """
+    Apply one patient status transition to the stats counters, atomically.
+    `old_status=None` is a new registration on `day`.
+    """
+    r = get_redis()
+    day_key = f"{STATS_DAY_KEY_PREFIX}{day}"
+    async with r.pipeline(transaction=True) as pipe:
+        if old_status in LIVE_STATUSES:
+            pipe.hincrby(STATS_LIVE_KEY, old_status, -1)
+        if new_status in LIVE_STATUSES:
+            pipe.hincrby(STATS_LIVE_KEY, new_status, 1)
+        else:
+            pipe.hincrby(day_key, new_status, 1)
+        if old_status is None:
+            pipe.hincrby(day_key, "registered", 1)
+        pipe.expire(day_key, STATS_DAY_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def get_status_counters(day: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """(live gauges, counters for `day`) — two HGETALLs in one round trip."""
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.hgetall(STATS_LIVE_KEY)
+        pipe.hgetall(f"{STATS_DAY_KEY_PREFIX}{day}")
+        live, daily = await pipe.execute()
+    return (
+        {k: int(v) for k, v in live.items()},
+        {k: int(v) for k, v in daily.items()},
+    )
+
+
+async def replace_status_counters(day: str, live: Dict[str, int], daily: Dict[str, int]) -> None:
+    """Overwrite the live gauges and `day`'s counters (reconciliation against the DB)."""
     r = get_redis()
-    await r.delete(QUEUE_KEY)
+    day_key = f"{STATS_DAY_KEY_PREFIX}{day}"
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.delete(STATS_LIVE_KEY, day_key)
+        if live:
+            pipe.hset(STATS_LIVE_KEY, mapping=live)
+        if daily:
+            pipe.hset(day_key, mapping=daily)
+            pipe.expire(day_key, STATS_DAY_TTL_SECONDS)
+        await pipe.execute()
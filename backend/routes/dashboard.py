@@ -0,0 +1,51 @@
+"""
+routes/dashboard.py – Aggregated dashboard snapshot endpoint
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database import get_db
+from dashboard import build_dashboard
+from redis_client import get_resource_version, QUEUE_VERSION_KEY, ROSTER_VERSION_KEY
+from http_cache import make_etag, not_modified, set_validators
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get("")
+async def get_dashboard(
+    request: Request,
+    response: Response,
+    queue_limit: Optional[int] = Query(None, ge=1, le=500, description="Top N waiting patients (full queue if omitted)"),
+    display: bool = Query(False, description="Lobby boards: the top DISPLAY_TOP_N, as their Socket.IO slice"),
+    events: int = Query(0, ge=0, le=200, description="Include this many recent events (0 = none)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queue (with the Socket.IO queue `version` it is at least as new as), doctor
+    roster, stats and optionally recent events from one session,
+    fenced by the queue version (see dashboard.py) — replaces the separate /patients/queue, /doctors,
+    /patients/stats and /staff/logs calls on dashboard load.
+    Answers 304 while neither the queue nor the roster changed (events excluded).
+    """
+    if display:
+        queue_limit = settings.DISPLAY_TOP_N
+
+    etag = None
+    if events == 0:
+        etag = make_etag(
+            "dashboard",
+            await get_resource_version(QUEUE_VERSION_KEY),
+            await get_resource_version(ROSTER_VERSION_KEY),
+            queue_limit or "all",
+            weak=True,
+        )
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        set_validators(response, etag)
+
+    return await build_dashboard(db, queue_limit=queue_limit, events_limit=events)
@@ -4,7 +4,7 @@ routes/doctors.py – Doctor listing and consultation action endpoints
 import json
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -18,22 +18,28 @@ from schemas import (
     SkipPatientRequest,
 )
 from doctor_engine import (
-    get_all_doctors,
+    get_roster,
     get_doctor_by_id,
+    lock_patient,
     start_consultation,
     complete_consultation,
     auto_assign_next_patient,
     format_doctor_response,
+    sync_doctor_availability,
 )
 from queue_engine import (
     remove_patient_from_queue,
     add_patient_to_queue,
+    demote_patient_in_queue,
+    invariant_scoring,
     recalculate_queue,
-    get_ordered_queue,
-    get_queue_stats,
+    record_status_change,
+    update_doctor_load,
 )
+from redis_client import set_doctor, bump_resource_versions, get_resource_version, ROSTER_VERSION_KEY
+from http_cache import make_etag, not_modified, set_validators
+from broadcast_coordinator import mark_queue_dirty
 from websocket_manager import (
-    broadcast_queue_updated,
     broadcast_patient_status_changed,
     broadcast_doctor_status_changed,
     broadcast_emergency_added,
@@ -42,37 +48,17 @@ from websocket_manager import (
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
 
-async def _broadcast_full_update(db: AsyncSession):
-    queue_data = await get_ordered_queue(db)
-    stats = await get_queue_stats(db)
-    await broadcast_queue_updated(queue_data, stats)
-
-
 @router.get("", response_model=list[DoctorResponse])
-async def list_doctors(db: AsyncSession = Depends(get_db)):
-    """List all doctors with current status."""
-    doctors = await get_all_doctors(db)
-    result_list = []
-    for doctor in doctors:
-        current_token = None
-        if doctor.current_patient_id:
-            res = await db.execute(
-                select(Patient.token_number).where(Patient.id == doctor.current_patient_id)
-            )
-            current_token = res.scalar_one_or_none()
-
-        result_list.append(DoctorResponse(
-            id=doctor.id,
-            name=doctor.name,
-            specialization=doctor.specialization,
-            is_active=doctor.is_active,
-            is_on_break=doctor.is_on_break,
-            is_available=doctor.is_available,
-            current_patient_id=doctor.current_patient_id,
-            current_patient_token=current_token,
-            total_consulted_today=doctor.total_consulted_today,
-        ))
-    return result_list
+async def list_doctors(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """List all doctors with current status. Answers 304 while the roster is unchanged."""
+    version = await get_resource_version(ROSTER_VERSION_KEY)
+    etag = make_etag("roster", version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_validators(response, etag)
+
+    return [DoctorResponse(**row) for row in await get_roster(db, version)]
 
 
 @router.post("", response_model=DoctorResponse, status_code=status.HTTP_201_CREATED)
@@ -82,6 +68,9 @@ async def create_doctor(payload: DoctorCreateRequest, db: AsyncSession = Depends
     db.add(doctor)
     await db.commit()
     await db.refresh(doctor)
+    await set_doctor(doctor.id, doctor.name, doctor.total_consulted_today)
+    await sync_doctor_availability(doctor)
+    await bump_resource_versions(ROSTER_VERSION_KEY)
     return DoctorResponse(
         id=doctor.id,
         name=doctor.name,
@@ -112,8 +101,9 @@ async def start_consult(
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    result = await db.execute(select(Patient).where(Patient.id == payload.patient_id))
-    patient = result.scalar_one_or_none()
+    # Lock the row until commit so two doctors cannot both start this patient;
+    # the loser waits for the winner's commit and then fails the status check
+    patient = await lock_patient(db, payload.patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
@@ -126,6 +116,8 @@ async def start_consult(
     # Update DB state
     await start_consultation(db, doctor, patient)
     await db.commit()
+    await sync_doctor_availability(doctor)
+    await record_status_change(PatientStatus.WAITING, PatientStatus.IN_CONSULTATION)
 
     # Remove from Redis queue
     await remove_patient_from_queue(patient.id)
@@ -143,7 +135,7 @@ async def start_consult(
     await broadcast_patient_status_changed(
         patient.id, patient.token_number, "in_consultation", doctor.name
     )
-    await _broadcast_full_update(db)
+    await mark_queue_dirty(roster_changed=True)
 
     return {
         "message": f"Consultation started for Token #{patient.token_number:03d}",
@@ -180,6 +172,9 @@ async def complete_consult(
     # Complete the consultation
     await complete_consultation(db, doctor, patient)
     await db.commit()
+    await sync_doctor_availability(doctor)
+    await record_status_change(PatientStatus.IN_CONSULTATION, PatientStatus.COMPLETED)
+    await update_doctor_load(doctor)
 
     # Log event
     event = EventLog(
@@ -204,7 +199,7 @@ async def complete_consult(
     await broadcast_doctor_status_changed(
         doctor.id, doctor.name, doctor.is_active, doctor.is_on_break, doctor.current_patient_id
     )
-    await _broadcast_full_update(db)
+    await mark_queue_dirty(roster_changed=True)
 
     return {
         "message": f"Consultation completed for Token #{patient.token_number:03d}",
@@ -233,13 +228,7 @@ async def skip_patient(
 
     # Reduce effective urgency for priority (not stored permanently)
     # We add them back with reduced score (not updating DB urgency)
-    from queue_engine import compute_priority, add_to_queue
-    reduced_urgency = max(1, patient.urgency - 2)
-    new_score = compute_priority(reduced_urgency, patient.created_at, 0.0)
-    # Override with reduced score (below other patients of same urgency)
-    new_score = max(0.1, new_score * 0.5)
-    from redis_client import add_to_queue as redis_add
-    await redis_add(patient.id, new_score)
+    new_score = await demote_patient_in_queue(patient)
 
     event = EventLog(
         event_type="patient_skipped",
@@ -249,7 +238,7 @@ async def skip_patient(
     db.add(event)
     await db.commit()
 
-    await _broadcast_full_update(db)
+    await mark_queue_dirty()
     return {"message": f"Token #{patient.token_number:03d} skipped and requeued at lower priority"}
 
 
@@ -272,8 +261,12 @@ async def flag_emergency(
     db.add(patient)
     await db.commit()
 
-    # Recompute entire queue
-    await recalculate_queue(db)
+    # Write the new urgency through to the patient's hash (display and scoring
+    # fields) in both modes; live scores of everyone else also need a full pass
+    if patient.status == PatientStatus.WAITING:
+        await add_patient_to_queue(patient)
+    if not invariant_scoring():
+        await recalculate_queue()
 
     event = EventLog(
         event_type="emergency_flagged",
@@ -285,6 +278,6 @@ async def flag_emergency(
 
     # Broadcast emergency event
     await broadcast_emergency_added(patient.id, patient.token_number, patient.name, 10)
-    await _broadcast_full_update(db)
+    await mark_queue_dirty()
 
     return {"message": f"Token #{patient.token_number:03d} flagged as EMERGENCY — queue recalculated"}
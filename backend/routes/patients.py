@@ -3,53 +3,52 @@ routes/patients.py – Patient registration and queue endpoints
 """
 import json
 from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from database import get_db
 from models import Patient, PatientStatus, EventLog
 from schemas import PatientRegisterRequest, PatientResponse, RegistrationResponse, QueueEntry
-from redis_client import get_next_token, queue_length
 from queue_engine import (
-    add_patient_to_queue,
-    get_ordered_queue,
+    enqueue_new_patient,
+    remove_patient_from_queue,
+    get_queue_view,
+    record_status_change,
     get_queue_stats,
     recalculate_queue,
     estimate_wait_time,
     get_queue_position,
 )
 from doctor_engine import get_optimal_doctor, assign_doctor_to_patient, format_doctor_response, get_all_doctors
-from websocket_manager import broadcast_queue_updated, broadcast_patient_status_changed
-from ml_engine.groq_engine import analyze_urgency
+from broadcast_coordinator import mark_queue_dirty
+from redis_client import get_resource_version, QUEUE_VERSION_KEY
+from http_cache import make_etag, not_modified, set_validators
+from archive import get_patient_record
+from websocket_manager import broadcast_patient_status_changed
+from triage import urgency_for_registration, schedule_triage
+from ml_engine.groq_engine import ENGINE_GROQ, ENGINE_CACHE
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
 
-async def _broadcast_full_update(db: AsyncSession):
-    """Helper: pull latest queue + stats and broadcast to all clients."""
-    queue_data = await get_ordered_queue(db)
-    stats = await get_queue_stats(db)
-    await broadcast_queue_updated(queue_data, stats)
-
-
 @router.post("/register", response_model=RegistrationResponse, status_code=status.HTTP_201_CREATED)
 async def register_patient(payload: PatientRegisterRequest, db: AsyncSession = Depends(get_db)):
     """
     Register a patient, get a token, join the Redis priority queue, and optionally
     get assigned to an available doctor. Emits queue_updated WebSocket event.
+    With TRIAGE_MODE=async the AI rating may complete after the response.
     """
-    # 1. Generate sequential token number
-    token_number = await get_next_token()
-
     # Determine urgency automatically if reason is provided
-    # The frontend is updated to send reason instead of hardcoded visitType
-    determined_urgency = await analyze_urgency(payload.reason)
+    # The frontend is updated to send reason instead of hardcoded visitType.
+    # In async triage mode an uncached reason registers with the submitted
+    # urgency as a provisional value and is rated after the response.
+    determined_urgency, triage_engine = await urgency_for_registration(payload.reason, payload.urgency)
 
-    # 2. Save patient to DB
+    # 1. Stage patient in DB (token is issued by the enqueue script below)
     patient = Patient(
-        token_number=token_number,
+        token_number=0,
         name=payload.name,
         phone=payload.phone,
         reason=payload.reason,
@@ -58,37 +57,45 @@ async def register_patient(payload: PatientRegisterRequest, db: AsyncSession = D
         created_at=datetime.now(timezone.utc),
     )
     db.add(patient)
-    await db.flush()  # Get the generated ID without committing
 
-    # 3. Assign optimal doctor if available
+    # 2. Assign optimal doctor if available
     doctor = await get_optimal_doctor(db)
     if doctor:
         await assign_doctor_to_patient(db, patient, doctor)
-        await db.flush()
+    await db.flush()  # Get the generated ID without committing
 
-    await db.commit()
+    # 3. Token + Redis priority queue + position in one round trip
+    token_number, position, _ = await enqueue_new_patient(patient)
+    patient.token_number = token_number
+    try:
+        await db.commit()
+    except Exception:
+        await remove_patient_from_queue(patient.id)
+        raise
+    await record_status_change(None, PatientStatus.WAITING)
     await db.refresh(patient)
-
-    # 4. Insert into Redis priority queue
-    score = await add_patient_to_queue(patient)
-    position = await get_queue_position(patient.id)
-    if position == -1:
-        position = await queue_length()
     wait_minutes = estimate_wait_time(position)
 
-    # 5. Log event
+    # 4. Log event
     event = EventLog(
         event_type="patient_registered",
         reference_id=patient.id,
-        metadata_json=json.dumps({"token": token_number, "urgency": determined_urgency, "ai_rated": True}),
+        metadata_json=json.dumps({
+            "token": token_number,
+            "urgency": determined_urgency,
+            "ai_rated": triage_engine in (ENGINE_GROQ, ENGINE_CACHE),
+            "triage_engine": triage_engine or "pending",
+        }),
     )
     db.add(event)
     await db.commit()
 
-    # 6. Broadcast WebSocket update
-    await _broadcast_full_update(db)
+    # 5. Broadcast WebSocket update
+    await mark_queue_dirty()
+    if triage_engine is None:
+        schedule_triage(patient.id, payload.reason, determined_urgency)
 
-    # 7. Build response
+    # 6. Build response
     doctor_name = None
     if patient.assigned_doctor_id:
         from sqlalchemy import select as sa_select
@@ -123,58 +130,47 @@ async def register_patient(payload: PatientRegisterRequest, db: AsyncSession = D
 
 
 @router.get("/queue", response_model=list[QueueEntry])
-async def get_queue(db: AsyncSession = Depends(get_db)):
+async def get_queue(
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0, description="Skip this many waiting patients"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Return at most this many waiting patients (top N when offset=0)"),
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Get the full live queue ordered by priority (highest urgency + longest wait first).
-    Also includes patients whose status is IN_CONSULTATION for the doctor view.
+    Get the live queue ordered by priority (highest urgency + longest wait first).
+    Without `limit` the full queue is returned; positions and ETAs are absolute either way.
+    The first page also includes patients whose status is IN_CONSULTATION for the doctor view.
+    Answers 304 while the queue version is unchanged. The validator is weak: the
+    displayed priority_score drifts with the clock between versions.
     """
-    ordered = await get_ordered_queue(db)
-    
-    # Also get in_consultation patients (not in Redis ZSET but shown on doctor view)
-    result = await db.execute(
-        select(Patient)
-        .where(Patient.status == PatientStatus.IN_CONSULTATION)
-    )
-    consulting = result.scalars().all()
-
-    from models import Doctor
-    consulting_entries = []
-    for p in consulting:
-        doc_name = None
-        if p.assigned_doctor_id:
-            res = await db.execute(select(Doctor.name).where(Doctor.id == p.assigned_doctor_id))
-            doc_name = res.scalar_one_or_none()
-        consulting_entries.append({
-            "id": p.id,
-            "token_number": p.token_number,
-            "name": p.name,
-            "reason": p.reason,
-            "urgency": p.urgency,
-            "status": p.status.value,
-            "assigned_doctor_id": p.assigned_doctor_id,
-            "assigned_doctor_name": doc_name,
-            "created_at": p.created_at.isoformat(),
-            "queue_position": 0,
-            "estimated_wait_minutes": 0,
-            "priority_score": 0.0,
-        })
-
-    return ordered + consulting_entries
+    etag = make_etag("queue", await get_resource_version(QUEUE_VERSION_KEY), offset, limit or "all", weak=True)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_validators(response, etag)
+
+    return await get_queue_view(db, offset=offset, limit=limit)
 
 
 @router.get("/stats")
-async def get_stats(db: AsyncSession = Depends(get_db)):
-    return await get_queue_stats(db)
+async def get_stats(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    etag = make_etag("stats", await get_resource_version(QUEUE_VERSION_KEY))
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_validators(response, etag)
+    return await get_queue_stats()
 
 
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(patient_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Patient).where(Patient.id == patient_id))
-    patient = result.scalar_one_or_none()
+    patient = await get_patient_record(db, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    position = await get_queue_position(patient.id)
+    # Archived (past-day) visits are never queued
+    position = await get_queue_position(patient.id) if isinstance(patient, Patient) else 0
     wait = estimate_wait_time(position) if position > 0 else 0
 
     return PatientResponse(
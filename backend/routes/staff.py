@@ -2,24 +2,26 @@
 routes/staff.py – Staff control endpoints
 """
 import json
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from database import get_db
 from models import Patient, PatientStatus, Doctor, EventLog
 from schemas import WalkInRequest, EmergencyRequest, ToggleDoctorRequest
-from redis_client import get_next_token, queue_length
+from redis_client import queue_length
 from queue_engine import (
-    add_patient_to_queue,
+    enqueue_new_patient,
+    invariant_scoring,
     recalculate_queue,
     remove_patient_from_queue,
-    get_ordered_queue,
-    get_queue_stats,
     estimate_wait_time,
     get_queue_position,
+    record_status_change,
+    update_doctor_load,
 )
 from doctor_engine import (
     get_optimal_doctor,
@@ -28,9 +30,12 @@ from doctor_engine import (
     auto_assign_next_patient,
     get_all_doctors,
     format_doctor_response,
+    sync_doctor_availability,
 )
+from broadcast_coordinator import mark_queue_dirty
+from dashboard import get_recent_events
+from archive import get_visits_on, get_events_on
 from websocket_manager import (
-    broadcast_queue_updated,
     broadcast_patient_status_changed,
     broadcast_doctor_status_changed,
     broadcast_emergency_added,
@@ -39,21 +44,13 @@ from websocket_manager import (
 router = APIRouter(prefix="/staff", tags=["staff"])
 
 
-async def _broadcast_full_update(db: AsyncSession):
-    queue_data = await get_ordered_queue(db)
-    stats = await get_queue_stats(db)
-    await broadcast_queue_updated(queue_data, stats)
-
-
 @router.post("/register-walkin", status_code=status.HTTP_201_CREATED)
 async def register_walkin(payload: WalkInRequest, db: AsyncSession = Depends(get_db)):
     """
     Staff registers a walk-in patient. Same flow as patient self-registration.
     """
-    token_number = await get_next_token()
-
     patient = Patient(
-        token_number=token_number,
+        token_number=0,
         name=payload.name,
         phone=payload.phone,
         reason=payload.reason,
@@ -62,20 +59,22 @@ async def register_walkin(payload: WalkInRequest, db: AsyncSession = Depends(get
         created_at=datetime.now(timezone.utc),
     )
     db.add(patient)
-    await db.flush()
 
     doctor = await get_optimal_doctor(db)
     if doctor:
         await assign_doctor_to_patient(db, patient, doctor)
-        await db.flush()
+    await db.flush()
 
-    await db.commit()
+    # Token + enqueue + position in one Redis round trip
+    token_number, position, _ = await enqueue_new_patient(patient)
+    patient.token_number = token_number
+    try:
+        await db.commit()
+    except Exception:
+        await remove_patient_from_queue(patient.id)
+        raise
+    await record_status_change(None, PatientStatus.WAITING)
     await db.refresh(patient)
-
-    score = await add_patient_to_queue(patient)
-    position = await get_queue_position(patient.id)
-    if position == -1:
-        position = await queue_length()
     wait_minutes = estimate_wait_time(position)
 
     event = EventLog(
@@ -86,7 +85,7 @@ async def register_walkin(payload: WalkInRequest, db: AsyncSession = Depends(get
     db.add(event)
     await db.commit()
 
-    await _broadcast_full_update(db)
+    await mark_queue_dirty()
 
     return {
         "token_number": token_number,
@@ -102,10 +101,8 @@ async def add_emergency(payload: EmergencyRequest, db: AsyncSession = Depends(ge
     """
     Staff adds an emergency patient — urgency forced to 10, placed at top of queue.
     """
-    token_number = await get_next_token()
-
     patient = Patient(
-        token_number=token_number,
+        token_number=0,
         name=payload.name,
         phone=payload.phone,
         reason=payload.reason,
@@ -114,21 +111,27 @@ async def add_emergency(payload: EmergencyRequest, db: AsyncSession = Depends(ge
         created_at=datetime.now(timezone.utc),
     )
     db.add(patient)
-    await db.flush()
 
     doctor = await get_optimal_doctor(db)
     if doctor:
         await assign_doctor_to_patient(db, patient, doctor)
-        await db.flush()
+    await db.flush()
 
-    await db.commit()
+    # Add with maximum score (will float to top) — token issued in the same call
+    token_number, position, _ = await enqueue_new_patient(patient)
+    patient.token_number = token_number
+    try:
+        await db.commit()
+    except Exception:
+        await remove_patient_from_queue(patient.id)
+        raise
+    await record_status_change(None, PatientStatus.WAITING)
     await db.refresh(patient)
 
-    # Add with maximum score (will float to top)
-    score = await add_patient_to_queue(patient)
-
-    # Recalculate so all relative positions are correct
-    await recalculate_queue(db)
+    # Live scores go stale between beats, so recalculate for correct relative positions
+    if not invariant_scoring():
+        await recalculate_queue()
+        position = await get_queue_position(patient.id)
 
     event = EventLog(
         event_type="emergency_added",
@@ -140,12 +143,12 @@ async def add_emergency(payload: EmergencyRequest, db: AsyncSession = Depends(ge
 
     # Broadcast emergency event then full queue update
     await broadcast_emergency_added(patient.id, token_number, patient.name, 10)
-    await _broadcast_full_update(db)
+    await mark_queue_dirty()
 
     return {
         "token_number": token_number,
         "patient_id": patient.id,
-        "queue_position": 1,
+        "queue_position": position,
         "message": f"Emergency Token #{token_number:03d} added — queue reshuffled.",
     }
 
@@ -168,6 +171,7 @@ async def mark_noshow(patient_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=400, detail=f"Patient already in terminal status: {patient.status}")
 
     old_status = patient.status
+    doctor = None
     patient.status = PatientStatus.NO_SHOW
     db.add(patient)
 
@@ -181,6 +185,11 @@ async def mark_noshow(patient_id: int, db: AsyncSession = Depends(get_db)):
             db.add(doctor)
 
     await db.commit()
+    if doctor is not None:
+        await sync_doctor_availability(doctor)
+    await record_status_change(old_status, PatientStatus.NO_SHOW)
+    if doctor is not None:
+        await update_doctor_load(doctor)
 
     # Remove from Redis queue
     await remove_patient_from_queue(patient.id)
@@ -194,7 +203,7 @@ async def mark_noshow(patient_id: int, db: AsyncSession = Depends(get_db)):
     await db.commit()
 
     await broadcast_patient_status_changed(patient.id, patient.token_number, "no_show", None)
-    await _broadcast_full_update(db)
+    await mark_queue_dirty(roster_changed=doctor is not None)
 
     return {"message": f"Token #{patient.token_number:03d} marked as NO-SHOW"}
 
@@ -244,6 +253,8 @@ async def toggle_doctor(
         if next_patient:
             await db.commit()
 
+    await sync_doctor_availability(doctor)
+
     event = EventLog(
         event_type="doctor_toggled",
         reference_id=doctor_id,
@@ -259,7 +270,7 @@ async def toggle_doctor(
     await broadcast_doctor_status_changed(
         doctor.id, doctor.name, doctor.is_active, doctor.is_on_break, doctor.current_patient_id
     )
-    await _broadcast_full_update(db)
+    await mark_queue_dirty(roster_changed=True)
 
     return {
         "doctor_id": doctor_id,
@@ -276,34 +287,34 @@ async def toggle_doctor(
 async def force_rebalance(db: AsyncSession = Depends(get_db)):
     """
     Force a full queue rebalance — recalculate all priority scores and re-emit.
-    Useful after bulk changes.
+    Rescoring is a single server-side Redis script. Useful after bulk changes.
     """
-    await recalculate_queue(db)
-    await _broadcast_full_update(db)
+    rescored = await recalculate_queue()
+    await mark_queue_dirty()
 
     queue_len = await queue_length()
     return {
-        "message": f"Queue rebalanced successfully. {queue_len} patients re-scored.",
+        "message": f"Queue rebalanced successfully. {rescored} patients re-scored.",
         "queue_length": queue_len,
     }
 
 
 @router.get("/logs")
-async def get_event_logs(limit: int = 50, db: AsyncSession = Depends(get_db)):
-    """Get recent event activity log."""
-    result = await db.execute(
-        select(EventLog)
-        .order_by(EventLog.timestamp.desc())
-        .limit(limit)
-    )
-    logs = result.scalars().all()
-    return [
-        {
-            "id": log.id,
-            "event_type": log.event_type,
-            "reference_id": log.reference_id,
-            "metadata": log.metadata_json,
-            "timestamp": log.timestamp.isoformat(),
-        }
-        for log in logs
-    ]
+async def get_event_logs(
+    limit: int = 50,
+    day: Optional[date] = Query(None, description="Clinic-local day, YYYY-MM-DD (includes archived events)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get recent event activity log, or a given day's log from the live table and the archive."""
+    if day is not None:
+        return await get_events_on(db, day, limit)
+    return await get_recent_events(db, limit)
+
+
+@router.get("/visits")
+async def get_visits(
+    visit_date: date = Query(..., description="Clinic-local day, YYYY-MM-DD"),
+    db: AsyncSession = Depends(get_db),
+):
+    """All visits on a given day — today's from the live table, past days' from the archive."""
+    return await get_visits_on(db, visit_date)
@@ -8,8 +8,8 @@ from sqlalchemy import select
 
 from database import AsyncSessionLocal
 from models import Doctor, Patient, PatientStatus
-from redis_client import get_next_token, add_to_queue
-from queue_engine import compute_priority, add_patient_to_queue
+from redis_client import get_next_token
+from queue_engine import add_patient_to_queue, sync_doctor_state
 
 
 SEED_DOCTORS = [
@@ -81,8 +81,7 @@ async def seed_if_empty():
             await db.flush()
 
             # Add to Redis queue
-            score = compute_priority(patient.urgency, patient.created_at)
-            await add_to_queue(patient.id, score)
+            await add_patient_to_queue(patient)
 
         # Mark first patient as IN_CONSULTATION with Dr. Priya Sharma
         # (to match the UI's "NOW CALLING" state)
@@ -103,4 +102,5 @@ async def seed_if_empty():
             await remove_from_queue(first_patient.id)
 
         await db.commit()
+        await sync_doctor_state(db)
         print(f"[Seed] Seeded {len(SEED_DOCTORS)} doctors and {len(SEED_PATIENTS)} patients ✓")
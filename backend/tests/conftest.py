@@ -0,0 +1,60 @@
+"""
+tests/conftest.py – Shared test setup
+
+Tests that need Postgres or Redis run against throwaway instances named by
+TEST_DATABASE_URL and TEST_REDIS_URL — both are wiped by the fixtures below —
+and are skipped when those are not set. DATABASE_URL / REDIS_URL are never used.
+
+    TEST_DATABASE_URL=postgresql+asyncpg://localhost/mediq_test \\
+    TEST_REDIS_URL=redis://localhost:6379/15 python -m pytest
+
+The database and Redis fixtures are module-scoped: a test module using them
+runs on one event loop (pytestmark = pytest.mark.asyncio(loop_scope="module"))
+and starts from an empty schema and an empty Redis.
+"""
+import os
+
+import pytest
+import pytest_asyncio
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+# config.py reads these at import time: point the app at the test instances, or
+# at placeholders nothing connects to when they are not configured
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql+asyncpg://unused/unused"
+os.environ["REDIS_URL"] = TEST_REDIS_URL or "redis://unused:6379/0"
+os.environ["SOCKETIO_MESSAGE_QUEUE"] = ""   # in-process Socket.IO manager
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def db_engine():
+    """The app's engine, on a freshly created schema."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    from sqlalchemy import text
+    from database import engine, create_tables
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP SCHEMA public CASCADE"))
+        await conn.execute(text("CREATE SCHEMA public"))
+    await create_tables()
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def redis():
+    """The app's Redis client (redis_client.init_redis()), on an empty database."""
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL not set")
+    import redis.asyncio as aioredis
+    import redis_client
+
+    flusher = aioredis.from_url(TEST_REDIS_URL)
+    await flusher.flushdb()
+    await flusher.aclose()
+    client = await redis_client.init_redis()
+    yield client
+    await redis_client.close_redis()
@@ -0,0 +1,126 @@
+"""
+auto_assign_next_patient against a registration still in flight.
+
+Registration enqueues a patient before committing their row, so a completion
+can pop them from the unassigned index while the row is invisible to it. The
+patient must stay queued and be claimable once the registration commits; only
+entries whose row is no longer WAITING are dropped. A claimed or reassigned
+patient's key carries their new doctor's load term.
+"""
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+
+from database import AsyncSessionLocal
+from doctor_engine import auto_assign_next_patient, reassign_waiting_patients
+from models import Doctor, Patient, PatientStatus
+from queue_engine import compute_queue_value, doctor_load_term, enqueue_new_patient
+from redis_client import PATIENT_KEY_PREFIX, QUEUE_KEY, UNASSIGNED_KEY, set_doctor
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def doctor_id(db_engine, redis):
+    async with AsyncSessionLocal() as db:
+        doctor = Doctor(name="Dr Claim", specialization="General Medicine")
+        db.add(doctor)
+        await db.commit()
+        return doctor.id
+
+
+def _new_patient(name: str) -> Patient:
+    return Patient(token_number=0, name=name, phone="9000000000", reason="Fever", urgency=5,
+                   status=PatientStatus.WAITING, created_at=datetime.now(timezone.utc))
+
+
+async def _claim(doctor_id: int):
+    async with AsyncSessionLocal() as db:
+        patient = await auto_assign_next_patient(db, await db.get(Doctor, doctor_id))
+        await db.commit()
+        return patient
+
+
+async def test_claim_before_registration_commits_keeps_patient_queued(redis, doctor_id):
+    async with AsyncSessionLocal() as registering:
+        patient = _new_patient("In flight")
+        registering.add(patient)
+        await registering.flush()
+        token_number, _, _ = await enqueue_new_patient(patient)
+        patient.token_number = token_number
+
+        # A completion runs before the registration commits: nothing to claim yet
+        assert await _claim(doctor_id) is None
+        assert await redis.zscore(UNASSIGNED_KEY, str(patient.id)) is not None
+        assert await redis.zscore(QUEUE_KEY, str(patient.id)) is not None
+        assert await redis.hget(PATIENT_KEY_PREFIX + str(patient.id), "doctor_id") == ""
+
+        await registering.commit()
+
+    claimed = await _claim(doctor_id)
+    assert claimed is not None and claimed.id == patient.id
+    assert claimed.assigned_doctor_id == doctor_id
+    assert await redis.zscore(UNASSIGNED_KEY, str(patient.id)) is None
+    assert await redis.hget(PATIENT_KEY_PREFIX + str(patient.id), "doctor_id") == str(doctor_id)
+
+
+async def test_finished_patient_is_dropped_from_queue(redis, doctor_id):
+    async with AsyncSessionLocal() as db:
+        patient = _new_patient("Already seen")
+        db.add(patient)
+        await db.flush()
+        await enqueue_new_patient(patient)
+        patient.status = PatientStatus.COMPLETED
+        await db.commit()
+
+    assert await _claim(doctor_id) is None
+    assert await redis.zscore(QUEUE_KEY, str(patient.id)) is None
+    assert await redis.zscore(UNASSIGNED_KEY, str(patient.id)) is None
+    assert not await redis.exists(PATIENT_KEY_PREFIX + str(patient.id))
+
+
+async def _expected_key(patient: Patient) -> float:
+    """The ZSET score add_patient_to_queue() would write for the patient as it is now."""
+    load = await doctor_load_term(patient.assigned_doctor_id)
+    return -compute_queue_value(patient.urgency, patient.created_at, load)
+
+
+async def test_claim_rescores_with_the_doctors_load(redis, doctor_id):
+    await set_doctor(doctor_id, "Dr Claim", 0)   # Least loaded: a full load term
+    async with AsyncSessionLocal() as db:
+        patient = _new_patient("Unassigned")
+        db.add(patient)
+        await db.flush()
+        await enqueue_new_patient(patient)
+        await db.commit()
+    unassigned_key = await redis.zscore(QUEUE_KEY, str(patient.id))
+
+    claimed = await _claim(doctor_id)
+    assert claimed.id == patient.id
+    expected = await _expected_key(claimed)
+    assert await redis.zscore(QUEUE_KEY, str(patient.id)) == pytest.approx(expected, abs=1e-3)
+    assert await redis.zscore(QUEUE_KEY, str(patient.id)) != unassigned_key
+
+
+async def test_reassignment_rescores_with_the_new_doctors_load(redis, doctor_id):
+    async with AsyncSessionLocal() as db:
+        leaving = Doctor(name="Dr Leaving", specialization="General Medicine", total_consulted_today=4)
+        db.add(leaving)
+        await db.flush()
+        patient = _new_patient("Orphaned")
+        patient.assigned_doctor_id = leaving.id
+        db.add(patient)
+        await db.flush()
+        await set_doctor(leaving.id, leaving.name, 4)
+        await set_doctor(doctor_id, "Dr Claim", 0)
+        await enqueue_new_patient(patient)
+        await db.commit()
+
+        assert await reassign_waiting_patients(db, leaving.id) == [patient.id]
+        await db.commit()
+        await db.refresh(patient)
+
+    assert patient.assigned_doctor_id is not None and patient.assigned_doctor_id != leaving.id
+    expected = await _expected_key(patient)
+    assert await redis.zscore(QUEUE_KEY, str(patient.id)) == pytest.approx(expected, abs=1e-3)
@@ -0,0 +1,56 @@
+"""
+A background triage rating landing after registration moves the patient's
+urgency by the rated amount without undoing a skip demotion made meanwhile.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import triage
+from database import AsyncSessionLocal
+from models import Patient, PatientStatus
+from queue_engine import URGENCY_WEIGHT, add_patient_to_queue, demote_patient_in_queue
+from redis_client import PATIENT_KEY_PREFIX, QUEUE_KEY
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+PROVISIONAL = 5
+RATED = 8
+
+
+async def _registered_patient() -> Patient:
+    async with AsyncSessionLocal() as db:
+        patient = Patient(token_number=1, name="Async", phone="9000000000", reason="Chest tightness",
+                          urgency=PROVISIONAL, status=PatientStatus.WAITING,
+                          created_at=datetime.now(timezone.utc) - timedelta(minutes=20))
+        db.add(patient)
+        await db.commit()
+        await add_patient_to_queue(patient)
+        return patient
+
+
+@pytest.fixture
+def rated(monkeypatch):
+    async def rate_urgency(reason, latency_budget_ms=None):
+        return RATED, "groq"
+
+    monkeypatch.setattr(triage, "rate_urgency", rate_urgency)
+
+
+@pytest.mark.parametrize("skipped", [False, True])
+async def test_rating_shifts_urgency_and_keeps_demotion(db_engine, redis, rated, skipped):
+    patient = await _registered_patient()
+    if skipped:
+        await demote_patient_in_queue(patient)
+    key = PATIENT_KEY_PREFIX + str(patient.id)
+    before = await redis.hgetall(key)
+    score_before = await redis.zscore(QUEUE_KEY, str(patient.id))
+
+    await triage._triage_and_rescore(patient.id, patient.reason, PROVISIONAL)
+
+    after = await redis.hgetall(key)
+    assert after["urgency"] == str(RATED)
+    assert int(after["score_urgency"]) == int(before["score_urgency"]) + RATED - PROVISIONAL
+    assert after["created_min"] == before["created_min"]
+    delta = (RATED - PROVISIONAL) * URGENCY_WEIGHT
+    assert await redis.zscore(QUEUE_KEY, str(patient.id)) == pytest.approx(score_before - delta, abs=1e-3)
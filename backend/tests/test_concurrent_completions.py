@@ -0,0 +1,129 @@
+"""
+Many doctors completing consultations at once against a queue of unassigned
+patients: every doctor gets a distinct next patient, nobody drops out of the
+queue, and completions run side by side instead of serialising.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+
+from database import AsyncSessionLocal
+from doctor_engine import sync_doctor_availability
+from models import Doctor, Patient, PatientStatus
+from queue_engine import add_patient_to_queue, sync_doctor_state
+from redis_client import QUEUE_KEY, UNASSIGNED_KEY
+from routes.doctors import complete_consult
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+COMPLETIONS = 32                    # Completions timed at each concurrency level
+CONCURRENCY_LEVELS = (1, 4, 8)      # Within the engine's pool_size, so no overflow connects are timed
+# Throughput at the top level vs one at a time. On a single core Postgres, Redis
+# and the app share the CPU, so only require that concurrency costs nothing.
+MIN_SPEEDUP = 1.5 if (os.cpu_count() or 1) > 1 else 0.8
+
+_tokens = iter(range(1, 100000))
+
+
+async def _seed(n_doctors: int, n_waiting: int) -> list[int]:
+    """`n_doctors` doctors each mid-consultation, and `n_waiting` unassigned queued patients."""
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    async with AsyncSessionLocal() as db:
+        doctors = [Doctor(name=f"Dr {next(_tokens)}", specialization="General Medicine") for _ in range(n_doctors)]
+        db.add_all(doctors)
+        await db.flush()
+        for doctor in doctors:
+            patient = Patient(token_number=next(_tokens), name="In chair", phone="9000000000", reason="Fever",
+                              urgency=5, status=PatientStatus.IN_CONSULTATION, assigned_doctor_id=doctor.id,
+                              created_at=start, consultation_start=start)
+            db.add(patient)
+            await db.flush()
+            doctor.current_patient_id = patient.id
+        waiting = [
+            Patient(token_number=next(_tokens), name="Waiting", phone="9000000000", reason="Fever",
+                    urgency=1 + i % 10, status=PatientStatus.WAITING, created_at=start + timedelta(seconds=i))
+            for i in range(n_waiting)
+        ]
+        db.add_all(waiting)
+        await db.commit()
+        await sync_doctor_state(db)
+        for doctor in doctors:
+            await sync_doctor_availability(doctor)
+        for patient in waiting:
+            await add_patient_to_queue(patient)
+        return [doctor.id for doctor in doctors]
+
+
+async def _complete(doctor_id: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        return await complete_consult(doctor_id, db)
+
+
+async def _complete_all(doctor_ids: list[int], concurrency: int) -> tuple[list[dict], float]:
+    """Complete for every doctor, `concurrency` at a time. Returns (responses, seconds)."""
+    responses = []
+    started = time.perf_counter()
+    for i in range(0, len(doctor_ids), concurrency):
+        responses += await asyncio.gather(*(_complete(d) for d in doctor_ids[i:i + concurrency]))
+    return responses, time.perf_counter() - started
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def clean(db_engine, redis):
+    return redis
+
+
+async def test_simultaneous_completions_claim_distinct_patients(clean):
+    redis = clean
+    await redis.delete(QUEUE_KEY, UNASSIGNED_KEY)
+    doctor_ids = await _seed(n_doctors=24, n_waiting=40)
+
+    responses, _ = await _complete_all(doctor_ids, concurrency=len(doctor_ids))
+
+    claimed = [r["next_patient_id"] for r in responses]
+    assert None not in claimed
+    assert len(set(claimed)) == len(claimed)
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Patient.id, Patient.assigned_doctor_id).where(Patient.id.in_(claimed))
+        )).all()
+        assert {pid: doc for pid, doc in rows} == {
+            r["next_patient_id"]: doctor_id for r, doctor_id in zip(responses, doctor_ids)
+        }
+        waiting = set((await db.execute(
+            select(Patient.id).where(Patient.status == PatientStatus.WAITING)
+        )).scalars())
+        unassigned = set((await db.execute(
+            select(Patient.id).where(Patient.status == PatientStatus.WAITING, Patient.assigned_doctor_id == None)
+        )).scalars())
+        completed = await db.scalar(
+            select(func.count()).select_from(Patient).where(Patient.status == PatientStatus.COMPLETED)
+        )
+
+    # Nobody lost: every waiting patient is still queued, the unclaimed ones still claimable
+    assert completed == len(doctor_ids)
+    assert {int(pid) for pid in await redis.zrange(QUEUE_KEY, 0, -1)} == waiting
+    assert {int(pid) for pid in await redis.zrange(UNASSIGNED_KEY, 0, -1)} == unassigned
+    assert len(unassigned) == 40 - len(doctor_ids)
+
+
+async def test_completion_throughput_scales_with_concurrency(clean):
+    redis = clean
+    throughput = {}
+    for concurrency in CONCURRENCY_LEVELS:
+        await redis.delete(QUEUE_KEY, UNASSIGNED_KEY)
+        doctor_ids = await _seed(n_doctors=COMPLETIONS, n_waiting=COMPLETIONS * 2)
+        responses, seconds = await _complete_all(doctor_ids, concurrency)
+        claimed = [r["next_patient_id"] for r in responses]
+        assert len(set(claimed)) == COMPLETIONS and None not in claimed
+        throughput[concurrency] = COMPLETIONS / seconds
+
+    print("completions/s by concurrency:", {c: round(t, 1) for c, t in throughput.items()})
+    levels = sorted(throughput)
+    assert throughput[levels[-1]] >= MIN_SPEEDUP * throughput[levels[0]], throughput
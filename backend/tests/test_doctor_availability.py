@@ -0,0 +1,61 @@
+"""
+The Redis availability index follows committed doctor changes only: a
+consultation whose transaction rolls back must leave the doctor listed.
+"""
+import pytest
+import pytest_asyncio
+
+from database import AsyncSessionLocal
+from doctor_engine import sync_doctor_availability
+from models import Doctor, Patient, PatientStatus
+from redis_client import AVAILABLE_DOCTORS_KEY
+from routes.doctors import complete_consult, start_consult
+from schemas import StartConsultationRequest
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def doctor_id(db_engine, redis):
+    async with AsyncSessionLocal() as db:
+        doctor = Doctor(name="Dr Index", specialization="General Medicine")
+        db.add(doctor)
+        await db.commit()
+        await sync_doctor_availability(doctor)
+        return doctor.id
+
+
+async def _waiting_patient() -> int:
+    async with AsyncSessionLocal() as db:
+        patient = Patient(token_number=1, name="Patient", phone="9000000000",
+                          reason="Fever", urgency=5, status=PatientStatus.WAITING)
+        db.add(patient)
+        await db.commit()
+        return patient.id
+
+
+async def test_rolled_back_start_leaves_doctor_available(redis, doctor_id):
+    patient_id = await _waiting_patient()
+
+    async with AsyncSessionLocal() as db:
+        async def failing_commit():
+            await db.rollback()
+            raise RuntimeError("commit failed")
+
+        db.commit = failing_commit
+        with pytest.raises(RuntimeError):
+            await start_consult(doctor_id, StartConsultationRequest(patient_id=patient_id), db)
+
+    assert await redis.zscore(AVAILABLE_DOCTORS_KEY, str(doctor_id)) == 0
+
+
+async def test_committed_consultation_updates_index(redis, doctor_id):
+    patient_id = await _waiting_patient()
+
+    async with AsyncSessionLocal() as db:
+        await start_consult(doctor_id, StartConsultationRequest(patient_id=patient_id), db)
+    assert await redis.zscore(AVAILABLE_DOCTORS_KEY, str(doctor_id)) is None
+
+    async with AsyncSessionLocal() as db:
+        await complete_consult(doctor_id, db)
+    assert await redis.zscore(AVAILABLE_DOCTORS_KEY, str(doctor_id)) == 1
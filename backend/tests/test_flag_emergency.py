@@ -0,0 +1,52 @@
+"""
+flag-emergency in both scoring modes: the new urgency reaches the patient's
+Redis hash (display and scoring fields) and the patient moves to the head.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from config import settings
+from database import AsyncSessionLocal
+from models import Patient, PatientStatus
+from queue_engine import add_patient_to_queue, displayed_score
+from redis_client import PATIENT_KEY_PREFIX, QUEUE_KEY, get_queue_ordered
+from routes.doctors import flag_emergency
+from schemas import FlagEmergencyRequest
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+
+async def _queue_patients(urgencies: list[int]) -> list[int]:
+    """Enqueue WAITING patients, the first one registered earliest."""
+    start = datetime.now(timezone.utc) - timedelta(minutes=30)
+    async with AsyncSessionLocal() as db:
+        patients = [
+            Patient(token_number=i + 1, name=f"Patient {i}", phone="9000000000", reason="Fever",
+                    urgency=urgency, status=PatientStatus.WAITING, created_at=start + timedelta(minutes=i))
+            for i, urgency in enumerate(urgencies)
+        ]
+        db.add_all(patients)
+        await db.commit()
+        for patient in patients:
+            await add_patient_to_queue(patient)
+        return [patient.id for patient in patients]
+
+
+@pytest.mark.parametrize("mode", ["invariant", "live"])
+async def test_flag_emergency_rescores_patient(db_engine, redis, monkeypatch, mode):
+    monkeypatch.setattr(settings, "QUEUE_SCORING_MODE", mode)
+    await redis.delete(QUEUE_KEY)
+    first, second, flagged = await _queue_patients([7, 6, 3])
+    before = await redis.zscore(QUEUE_KEY, str(flagged))
+
+    async with AsyncSessionLocal() as db:
+        await flag_emergency(1, FlagEmergencyRequest(patient_id=flagged), db)
+
+    fields = await redis.hgetall(PATIENT_KEY_PREFIX + str(flagged))
+    assert fields["urgency"] == "10"
+    assert fields["score_urgency"] == "10"
+    assert await redis.zscore(QUEUE_KEY, str(flagged)) != before
+    ordered = [int(pid) for pid, _ in await get_queue_ordered()]
+    assert ordered == [flagged, first, second]
+    assert displayed_score(-(await get_queue_ordered(0, 1))[0][1]) > 6.0
@@ -0,0 +1,25 @@
+"""
+Local classifier against its own guidelines: every example phrase maps to its
+band, and inflected or derived wordings of an example score like the example.
+"""
+import pytest
+
+from ml_engine.local_triage import classify_urgency, parse_guideline_examples
+
+
+@pytest.mark.parametrize("phrase, urgency", parse_guideline_examples())
+def test_guideline_example_maps_to_its_band(phrase, urgency):
+    assert classify_urgency(phrase) == urgency
+
+
+@pytest.mark.parametrize("reason, urgency", [
+    ("unconscious", 10),
+    ("Patient is unconscious", 10),
+    ("bleeding heavily", 10),
+    ("I can't breathe", 10),
+    ("trouble breathing", 10),
+    ("sore throats", 4),
+    ("stroke symptom", 10),
+])
+def test_variant_wording_scores_like_its_example(reason, urgency):
+    assert classify_urgency(reason) == urgency
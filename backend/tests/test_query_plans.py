@@ -0,0 +1,168 @@
+"""
+Index usage of the hot-path queries.
+
+Each case runs the real application function against a seeded database,
+captures the SQL it sends, and EXPLAINs every statement that touches a hot
+table with sequential scans disabled — so the planner uses an index whenever
+one can serve the predicate, and a Seq Scan means the supporting index is
+missing or no longer matches the query. Because the statements are captured
+from the application itself, the checked query shapes cannot drift from it.
+"""
+import json
+import re
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+
+from archive import get_events_on, get_visits_on
+from dashboard import get_recent_events
+from database import AsyncSessionLocal
+from doctor_engine import auto_assign_next_patient, load_roster, lock_patient, reassign_waiting_patients
+from models import Doctor, clinic_day
+from queue_engine import get_queue_view, reconcile_queue_stats
+from redis_client import UNASSIGNED_KEY
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+HOT_TABLES = ("patients", "event_logs", "patients_archive", "event_logs_archive")
+_HOT_TABLE_RE = re.compile(r"\b(%s)\b" % "|".join(HOT_TABLES))
+
+SEED_SQL = """
+INSERT INTO doctors (id, name, specialization, is_active, is_on_break, total_consulted_today)
+SELECT g, 'Dr ' || g, 'General Medicine', true, false, g FROM generate_series(1, 6) g;
+
+-- Today: 3 in consultation, 60 waiting (some unassigned), the rest finished
+INSERT INTO patients (id, token_number, name, phone, reason, urgency, status,
+                      assigned_doctor_id, created_at, consultation_start, consultation_end, visit_date)
+SELECT g, g, 'Patient ' || g, '9000000000', 'Fever', 1 + g % 10,
+       (CASE WHEN g <= 3 THEN 'IN_CONSULTATION'
+             WHEN g <= 63 THEN 'WAITING'
+             WHEN g % 10 = 0 THEN 'NO_SHOW'
+             ELSE 'COMPLETED' END)::patientstatus,
+       CASE WHEN g <= 3 THEN g WHEN g <= 63 THEN NULLIF(g % 7, 0) ELSE 1 + g % 6 END,
+       now() - make_interval(secs => g * 5),
+       CASE WHEN g <= 3 OR g > 63 THEN now() - make_interval(secs => g * 4) END,
+       CASE WHEN g > 63 THEN now() - make_interval(secs => g * 3) END,
+       CAST(:today AS date)
+FROM generate_series(1, 5000) g;
+SELECT setval(pg_get_serial_sequence('patients', 'id'), 5000);
+UPDATE doctors SET current_patient_id = id WHERE id <= 3;
+
+INSERT INTO event_logs (event_type, reference_id, metadata_json, timestamp)
+SELECT (ARRAY['patient_registered', 'consultation_started',
+              'consultation_completed', 'patient_noshow'])[1 + g % 4],
+       g % 5000, '{}', now() - make_interval(secs => g)
+FROM generate_series(1, 20000) g;
+
+-- A year of history
+INSERT INTO patients_archive (id, token_number, name, phone, reason, urgency, status,
+                              assigned_doctor_id, created_at, visit_date, archived_at)
+SELECT 100000 + g, 1 + g % 300, 'Patient ' || g, '9000000000', 'Fever', 1 + g % 10,
+       'COMPLETED'::patientstatus, 1 + g % 6,
+       now() - make_interval(days => 1 + g % 365), CAST(:today AS date) - (1 + g % 365), now()
+FROM generate_series(1, 60000) g;
+
+INSERT INTO event_logs_archive (id, event_type, reference_id, metadata_json, timestamp, archived_at)
+SELECT 100000 + g, 'consultation_completed', g, '{}',
+       now() - make_interval(days => 1 + g % 365, secs => g % 3600), now()
+FROM generate_series(1, 120000) g;
+"""
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def seeded(db_engine, redis):
+    async with db_engine.begin() as conn:
+        for statement in SEED_SQL.split(";"):
+            if statement.strip():
+                await conn.execute(text(statement), {"today": clinic_day()})
+    async with db_engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+    # Unassigned waiting patients, claimable by auto_assign_next_patient
+    await redis.zadd(UNASSIGNED_KEY, {str(pid): -pid for pid in range(7, 64, 7)})
+    return db_engine
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def explain_app_queries(engine, run) -> dict:
+    """
+    Run `run(db)` in a rolled-back session, then EXPLAIN each hot-table statement
+    it sent. Returns {"statements": n, "indexes": {...}, "seq_scans": {...}}.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if _HOT_TABLE_RE.search(statement) and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with AsyncSessionLocal() as db:
+            await run(db)
+            await db.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    indexes, seq_scans = set(), set()
+    async with engine.connect() as conn:
+        await conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for statement, parameters in statements:
+            raw = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar_one()
+            plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+            for node in _plan_nodes(plan):
+                if "Index Name" in node:
+                    indexes.add(node["Index Name"])
+                if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+                    seq_scans.add(node["Relation Name"])
+        await conn.rollback()
+    return {"statements": len(statements), "indexes": indexes, "seq_scans": seq_scans}
+
+
+async def _auto_assign(db):
+    await auto_assign_next_patient(db, await db.get(Doctor, 4))
+
+
+# Either unique index on patients.id serves a primary-key lookup
+PATIENT_ID = {"patients_pkey", "ix_patients_id"}
+PATIENT_STATUS = {"ix_patients_status", "ix_patients_status_doctor"}
+
+
+@pytest.mark.parametrize(
+    "run, expected",
+    [
+        pytest.param(lambda db: get_queue_view(db), [PATIENT_STATUS], id="in_consultation"),
+        pytest.param(lambda db: reassign_waiting_patients(db, 1), [{"ix_patients_status_doctor"}], id="reassign"),
+        pytest.param(_auto_assign, [PATIENT_ID], id="auto_assign_claim"),
+        pytest.param(lambda db: lock_patient(db, 10), [PATIENT_ID], id="lock_patient"),
+        pytest.param(lambda db: load_roster(db), [PATIENT_ID], id="roster"),
+        pytest.param(lambda db: get_recent_events(db, 50), [{"ix_event_logs_timestamp"}], id="recent_events"),
+        pytest.param(
+            lambda db: reconcile_queue_stats(db),
+            [PATIENT_STATUS, {"ix_patients_visit_date"}, {"ix_event_logs_event_type"}],
+            id="stats_reconciliation",
+        ),
+        pytest.param(
+            lambda db: get_visits_on(db, clinic_day()),
+            [{"ix_patients_visit_date"}, {"ix_patients_archive_visit_date"}],
+            id="visits_on",
+        ),
+        pytest.param(
+            lambda db: get_events_on(db, clinic_day()),
+            [{"ix_event_logs_timestamp"}, {"ix_event_logs_archive_timestamp"}],
+            id="events_on",
+        ),
+    ],
+)
+async def test_hot_query_uses_index(seeded, run, expected):
+    """`expected`: one set of acceptable indexes per predicate the function must serve."""
+    result = await explain_app_queries(seeded, run)
+    assert result["statements"] > 0
+    assert result["seq_scans"] == set()
+    for acceptable in expected:
+        assert acceptable & result["indexes"], f"none of {acceptable} used; got {result['indexes']}"
@@ -0,0 +1,77 @@
+"""
+Queue snapshot versions: concurrent broadcasts (several workers, Celery) get
+strictly increasing versions that chain base -> version without gaps, the
+REST dashboard reports the version its queue is at least as new as, and every
+audience room is sent each version.
+"""
+import asyncio
+import json
+
+import pytest
+
+from config import settings
+from dashboard import build_dashboard
+from database import AsyncSessionLocal
+from redis_client import get_redis, replace_doctors
+from websocket_manager import (
+    HISTORY_KEY,
+    SNAPSHOT_KEY,
+    VERSION_KEY,
+    _swap_last_snapshot,
+    broadcast_queue_updated,
+    current_queue_version,
+    room_name,
+    sio,
+)
+from wire_format import available_encodings
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+SWAPS = 40
+
+
+async def test_concurrent_swaps_chain_versions(redis):
+    await redis.delete(VERSION_KEY, SNAPSHOT_KEY, HISTORY_KEY)
+    snapshots = [{"queue": [{"id": n}], "stats": {"n": n}} for n in range(SWAPS)]
+
+    previous = await asyncio.gather(*(_swap_last_snapshot(s) for s in snapshots))
+
+    versions = [s["version"] for s in snapshots]
+    assert sorted(versions) == list(range(1, SWAPS + 1))
+    # Each swap's base is exactly the snapshot stored one version earlier
+    for snapshot, prev in zip(snapshots, previous):
+        if snapshot["version"] == 1:
+            assert prev is None
+        else:
+            assert prev["version"] == snapshot["version"] - 1
+    stored = json.loads(await redis.get(SNAPSHOT_KEY))
+    assert stored["version"] == SWAPS
+    assert stored["stats"] == snapshots[versions.index(SWAPS)]["stats"]
+    assert await redis.hlen(HISTORY_KEY) == min(SWAPS, settings.REPLAY_LOG_SIZE - 1)
+    assert json.loads(await redis.hget(HISTORY_KEY, str(SWAPS - 1)))["version"] == SWAPS - 1
+
+
+async def test_dashboard_reports_queue_version(db_engine, redis):
+    await _swap_last_snapshot({"queue": [], "stats": {}})
+    async with AsyncSessionLocal() as db:
+        snapshot = await build_dashboard(db)
+    assert snapshot["version"] == await current_queue_version()
+    assert "queue" in snapshot
+
+    async with AsyncSessionLocal() as db:
+        assert "version" not in await build_dashboard(db, include_queue=False)
+    assert get_redis() is redis
+
+
+async def test_broadcast_reaches_every_audience_and_encoding(redis, monkeypatch):
+    await replace_doctors({7: "Dr Seven", 9: "Dr Nine"}, {7: 0, 9: 0})
+    sent = {}
+
+    async def record(event, data, room=None, **kwargs):
+        sent[room] = event
+
+    monkeypatch.setattr(sio, "emit", record)
+    await broadcast_queue_updated([], {})
+
+    audiences = ["staff", "display", "kiosk", "doctor:7", "doctor:9"]
+    assert set(sent) == {room_name(a, e) for a in audiences for e in available_encodings()}
@@ -0,0 +1,80 @@
+"""
+Two doctors starting the same patient at once: exactly one wins.
+
+Both requests run concurrently on their own sessions. The loser blocks on the
+patient's row lock until the winner commits, then sees IN_CONSULTATION and is
+refused with 400; the patient ends up with exactly one doctor.
+"""
+import asyncio
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from database import AsyncSessionLocal
+from models import Doctor, Patient, PatientStatus
+from queue_engine import add_patient_to_queue
+from routes.doctors import start_consult
+from schemas import StartConsultationRequest
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+ROUNDS = 5
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def doctors(db_engine, redis):
+    async with AsyncSessionLocal() as db:
+        roster = [Doctor(name=f"Dr {n}", specialization="General Medicine") for n in (1, 2)]
+        db.add_all(roster)
+        await db.commit()
+        return [doctor.id for doctor in roster]
+
+
+async def _waiting_patient(token: int) -> int:
+    async with AsyncSessionLocal() as db:
+        patient = Patient(token_number=token, name=f"Patient {token}", phone="9000000000",
+                          reason="Fever", urgency=5, status=PatientStatus.WAITING)
+        db.add(patient)
+        await db.commit()
+        await add_patient_to_queue(patient)
+        return patient.id
+
+
+async def _start(doctor_id: int, patient_id: int):
+    async with AsyncSessionLocal() as db:
+        try:
+            return await start_consult(doctor_id, StartConsultationRequest(patient_id=patient_id), db)
+        except HTTPException as exc:
+            return exc
+
+
+async def _free(doctor_ids: list[int]) -> None:
+    async with AsyncSessionLocal() as db:
+        for doctor in (await db.execute(select(Doctor).where(Doctor.id.in_(doctor_ids)))).scalars():
+            doctor.current_patient_id = None
+        await db.commit()
+
+
+@pytest.mark.parametrize("round_", range(ROUNDS))
+async def test_concurrent_start_consult_has_one_winner(doctors, round_):
+    patient_id = await _waiting_patient(round_ + 1)
+
+    results = await asyncio.gather(*(_start(doctor_id, patient_id) for doctor_id in doctors))
+
+    winners = [r for r in results if isinstance(r, dict)]
+    losers = [r for r in results if isinstance(r, HTTPException)]
+    assert len(winners) == 1 and len(losers) == 1
+    assert losers[0].status_code == 400
+    assert "not in WAITING" in losers[0].detail
+
+    async with AsyncSessionLocal() as db:
+        patient = await db.get(Patient, patient_id)
+        assert patient.status == PatientStatus.IN_CONSULTATION
+        holders = await db.scalar(
+            select(func.count()).select_from(Doctor).where(Doctor.current_patient_id == patient_id)
+        )
+        assert holders == 1
+        assert winners[0]["doctor_id"] in doctors
+    await _free(doctors)
@@ -0,0 +1,103 @@
+"""
+UrgencyBatcher against a fake rating client: de-duplication, flushing at the
+batch size and on the timer, and fan-out of a failed batch.
+"""
+import asyncio
+from typing import Optional
+
+from ml_engine.triage_batcher import UrgencyBatcher
+
+LONG_WAIT = 60.0  # A timer that must never be the reason a test finishes
+
+
+class FakeClient:
+    """Records every batch and rates each reason by its length."""
+
+    def __init__(self, fail: bool = False, short_by: int = 0):
+        self.batches: list[list[str]] = []
+        self.fail = fail
+        self.short_by = short_by
+
+    async def rate_batch(self, reasons: list[str]) -> list[Optional[int]]:
+        self.batches.append(list(reasons))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        ratings = [min(10, len(reason)) for reason in reasons]
+        return ratings[: len(ratings) - self.short_by]
+
+
+async def test_identical_reasons_are_sent_once():
+    client = FakeClient()
+    batcher = UrgencyBatcher(client.rate_batch, max_batch=8, max_wait_seconds=0.01)
+
+    ratings = await asyncio.gather(
+        batcher.rate("Fever"), batcher.rate("fever!"), batcher.rate("  FEVER "), batcher.rate("Chest pain")
+    )
+
+    assert client.batches == [["Fever", "Chest pain"]]
+    assert ratings == [5, 5, 5, 10]
+    assert batcher.stats() == {"batches": 1, "items": 2, "avg_batch_size": 2.0}
+
+
+async def test_flushes_at_batch_size_without_waiting_for_timer():
+    client = FakeClient()
+    batcher = UrgencyBatcher(client.rate_batch, max_batch=3, max_wait_seconds=LONG_WAIT)
+
+    ratings = await asyncio.wait_for(
+        asyncio.gather(batcher.rate("a"), batcher.rate("bb"), batcher.rate("ccc")), timeout=1.0
+    )
+
+    assert client.batches == [["a", "bb", "ccc"]]
+    assert ratings == [1, 2, 3]
+
+
+async def test_overflow_starts_a_new_batch():
+    client = FakeClient()
+    batcher = UrgencyBatcher(client.rate_batch, max_batch=2, max_wait_seconds=0.01)
+
+    ratings = await asyncio.gather(*(batcher.rate(reason) for reason in ("a", "bb", "ccc")))
+
+    assert client.batches == [["a", "bb"], ["ccc"]]
+    assert ratings == [1, 2, 3]
+
+
+async def test_partial_batch_flushes_on_timer():
+    client = FakeClient()
+    batcher = UrgencyBatcher(client.rate_batch, max_batch=16, max_wait_seconds=0.05)
+
+    pending = asyncio.gather(batcher.rate("a"), batcher.rate("bb"))
+    await asyncio.sleep(0.01)
+    assert client.batches == []  # Still collecting
+
+    assert await asyncio.wait_for(pending, timeout=1.0) == [1, 2]
+    assert client.batches == [["a", "bb"]]
+
+
+async def test_failed_batch_resolves_every_waiter_to_none():
+    client = FakeClient(fail=True)
+    batcher = UrgencyBatcher(client.rate_batch, max_batch=16, max_wait_seconds=0.01)
+
+    ratings = await asyncio.gather(batcher.rate("Fever"), batcher.rate("fever"), batcher.rate("Cough"))
+
+    assert ratings == [None, None, None]
+    assert len(client.batches) == 1
+
+
+async def test_mis_sized_result_resolves_every_waiter_to_none():
+    client = FakeClient(short_by=1)
+    batcher = UrgencyBatcher(client.rate_batch, max_batch=16, max_wait_seconds=0.01)
+
+    ratings = await asyncio.gather(batcher.rate("Fever"), batcher.rate("Cough"))
+
+    assert ratings == [None, None]
+
+
+async def test_batcher_recovers_after_a_failed_batch():
+    client = FakeClient(fail=True)
+    batcher = UrgencyBatcher(client.rate_batch, max_batch=16, max_wait_seconds=0.01)
+    assert await batcher.rate("Fever") is None
+
+    client.fail = False
+    assert await batcher.rate("Fever") == 5
+    assert batcher.stats()["batches"] == 2
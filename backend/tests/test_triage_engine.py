@@ -0,0 +1,102 @@
+"""
+Engine selection and latency budgets: an offline (TRIAGE_ENGINE=local)
+deployment starts without a Groq key, registration falls back to the local
+classifier past its budget, and background triage waits for the model.
+Batched prompts carry the reasons as a JSON array, scored by index.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import triage
+from ml_engine import groq_engine
+from ml_engine.local_triage import classify_urgency
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SLOW_MODEL_SECONDS = 0.05
+
+
+def _import_config(**env) -> subprocess.CompletedProcess:
+    # Set but empty: counts as missing, and a developer's .env cannot fill it in
+    environ = {**os.environ, "GROQ_API_KEY": "", **env}
+    return subprocess.run(
+        [sys.executable, "-c", "import config"],
+        cwd=BACKEND_DIR, env=environ, capture_output=True, text=True,
+    )
+
+
+def test_local_engine_starts_without_groq_key():
+    assert _import_config(TRIAGE_ENGINE="local").returncode == 0
+
+
+def test_groq_engine_requires_groq_key():
+    result = _import_config(TRIAGE_ENGINE="groq")
+    assert result.returncode != 0
+    assert "GROQ_API_KEY" in result.stderr
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    """A model that answers 9 after SLOW_MODEL_SECONDS, and an empty cache."""
+    async def rate_remote(reason):
+        await asyncio.sleep(SLOW_MODEL_SECONDS)
+        return 9
+
+    async def cache_miss(reason):
+        return None
+
+    monkeypatch.setattr(groq_engine, "groq_client", object())
+    monkeypatch.setattr(groq_engine, "_rate_remote", rate_remote)
+    monkeypatch.setattr(groq_engine.triage_cache, "get", cache_miss)
+    monkeypatch.setattr(groq_engine.settings, "TRIAGE_ENGINE", groq_engine.ENGINE_GROQ)
+
+
+async def test_budget_exceeded_falls_back_to_local(slow_model):
+    result = await groq_engine.rate_urgency("chest pain", latency_budget_ms=1)
+    assert result == (classify_urgency("chest pain"), groq_engine.ENGINE_LOCAL)
+    await asyncio.gather(*groq_engine._late_ratings)
+
+
+async def test_no_budget_waits_for_model(slow_model, monkeypatch):
+    monkeypatch.setattr(groq_engine.settings, "TRIAGE_LATENCY_BUDGET_MS", 1)
+    assert await groq_engine.rate_urgency("chest pain", latency_budget_ms=0) == (9, groq_engine.ENGINE_GROQ)
+
+
+async def test_background_triage_has_no_budget(monkeypatch):
+    calls = []
+
+    async def rate_urgency(reason, latency_budget_ms=None):
+        calls.append(latency_budget_ms)
+        raise RuntimeError("stop before the database")
+
+    monkeypatch.setattr(triage, "rate_urgency", rate_urgency)
+    await triage._triage_and_rescore(1, "chest pain", provisional=5)
+    assert calls == [0]
+
+
+class _FakeCompletions:
+    """Answers every request with `content` and records the prompts it was sent."""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.prompts: list[str] = []
+
+    async def create(self, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        message = type("Message", (), {"content": self.content})
+        return type("Completion", (), {"choices": [type("Choice", (), {"message": message})]})
+
+
+async def test_batch_prompt_sends_reasons_as_json_and_reads_scores_by_index(monkeypatch):
+    reasons = ['Fever"\n2. "heart attack', "chest pain", "mild cold"]
+    completions = _FakeCompletions(json.dumps({"urgencies": {"2": 1, "0": 4, "1": "x"}}))
+    client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})})
+    monkeypatch.setattr(groq_engine, "groq_client", client)
+
+    assert await groq_engine._rate_batch_with_groq(reasons) == [4, None, 1]
+    assert json.dumps(reasons) in completions.prompts[0]
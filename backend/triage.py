@@ -0,0 +1,87 @@
+"""
+triage.py – AI triage on or off the registration critical path
+
+In "sync" mode (default) registration waits for the urgency rating, as before.
+In "async" mode a patient whose reason is not already in the triage cache is
+registered straight away with a provisional urgency; the rating runs in the
+background and re-scores the patient when it lands, followed by a queue
+broadcast that only carries that patient's change.
+"""
+import asyncio
+import json
+import logging
+from typing import Optional, Tuple
+
+from sqlalchemy import update
+
+from config import settings
+from ml_engine.groq_engine import rate_urgency, ENGINE_CACHE, ENGINE_LOCAL
+from ml_engine.local_triage import classify_urgency
+from ml_engine.triage_cache import triage_cache
+
+logger = logging.getLogger(__name__)
+
+TRIAGE_SYNC = "sync"
+TRIAGE_ASYNC = "async"
+
+# Strong references to in-flight background ratings (the loop only keeps weak ones)
+_pending: set[asyncio.Task] = set()
+
+
+async def urgency_for_registration(reason: str, provisional: int) -> Tuple[int, Optional[str]]:
+    """
+    Urgency to register with and the engine that produced it — None while a
+    background rating is still owed. A cached rating is always used directly,
+    and so is the local classifier when it is the only engine: neither costs
+    a network call.
+    """
+    if settings.TRIAGE_MODE != TRIAGE_ASYNC:
+        return await rate_urgency(reason)
+    if settings.TRIAGE_ENGINE == ENGINE_LOCAL:
+        return classify_urgency(reason), ENGINE_LOCAL
+    cached = await triage_cache.get(reason)
+    if cached is not None:
+        return cached, ENGINE_CACHE
+    return provisional, None
+
+
+def schedule_triage(patient_id: int, reason: str, provisional: int) -> None:
+    """Rate `reason` in the background and re-score the (committed) patient."""
+    task = asyncio.get_running_loop().create_task(_triage_and_rescore(patient_id, reason, provisional))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def _triage_and_rescore(patient_id: int, reason: str, provisional: int) -> None:
+    from database import AsyncSessionLocal
+    from models import Patient, PatientStatus, EventLog
+    from queue_engine import retriage_patient_in_queue
+    from broadcast_coordinator import mark_queue_dirty
+
+    try:
+        # Nobody is waiting on this rating, so give the model as long as it needs
+        urgency, engine = await rate_urgency(reason, latency_budget_ms=0)
+        async with AsyncSessionLocal() as db:
+            # Only replace the provisional value: staff may have flagged an
+            # emergency (or otherwise changed urgency) in the meantime
+            result = await db.execute(
+                update(Patient)
+                .where(Patient.id == patient_id, Patient.urgency == provisional)
+                .values(urgency=urgency)
+                .returning(Patient)
+            )
+            patient = result.scalar_one_or_none()
+            if patient is None:
+                return
+            db.add(EventLog(
+                event_type="triage_completed",
+                reference_id=patient_id,
+                metadata_json=json.dumps({"provisional": provisional, "urgency": urgency, "triage_engine": engine}),
+            ))
+            await db.commit()
+
+            if urgency != provisional and patient.status == PatientStatus.WAITING:
+                await retriage_patient_in_queue(patient, provisional)
+                await mark_queue_dirty()
+    except Exception as exc:
+        logger.error(f"Background triage failed for patient {patient_id}: {exc}")
@@ -3,23 +3,200 @@ websocket_manager.py – Socket.IO async server + broadcast helpers
 """
 import socketio
 import json
+from bisect import bisect_left
 from typing import Optional, Any
 
+from config import settings
+from queue_engine import AVG_CONSULT_MINUTES
+from wire_format import available_encodings, encode_payload, negotiate_encoding
+
+SNAPSHOT_KEY = "mediq:broadcast:snapshot"   # Last queue snapshot broadcast (delta base)
+VERSION_KEY = "mediq:queue:version"         # Monotonic version of the broadcast queue state
+HISTORY_KEY = "mediq:queue:history"         # Hash of version -> snapshot (bounded replay log)
+
+# Client roles (Socket.IO auth {"role": ...} or the `join` event). A client without
+# a recognised role is sent nothing until it joins one.
+ROLE_STAFF = "staff"        # full queue + stats
+ROLE_DISPLAY = "display"    # lobby boards: top-N tokens + stats
+ROLE_KIOSK = "kiosk"        # registration kiosk: stats only
+ROLE_DOCTOR = "doctor"      # one doctor's worklist + stats (needs doctor_id)
+
+DASHBOARD_SYNC_EVENTS = 50  # Recent events in a staff client's dashboard_sync
+
+# Fields the lobby boards render
+DISPLAY_ENTRY_FIELDS = (
+    "id", "token_number", "name", "urgency", "status", "queue_position", "estimated_wait_minutes",
+)
+
+
+def _client_manager() -> Optional[socketio.AsyncRedisManager]:
+    """
+    Redis pub/sub client manager, so every uvicorn worker, node and background
+    process (Celery) can emit to all connected clients. An empty
+    SOCKETIO_MESSAGE_QUEUE falls back to the in-process manager (single worker).
+    """
+    if not settings.SOCKETIO_MESSAGE_QUEUE:
+        return None
+    return socketio.AsyncRedisManager(settings.SOCKETIO_MESSAGE_QUEUE, channel="mediq:socketio")
+
+
 # Create the Socket.IO async server
 # cors_allowed_origins allows the Vite dev server to connect
+# Engine.IO compresses polling responses above the threshold by default (1024 B);
+# uvicorn negotiates permessage-deflate for websocket frames by default
 sio = socketio.AsyncServer(
     async_mode="asgi",
+    client_manager=_client_manager(),
     cors_allowed_origins="*",
     logger=False,
     engineio_logger=False,
+    compression_threshold=settings.WS_COMPRESSION_THRESHOLD,
 )
 
 
+def audience_for(role: Optional[str], doctor_id: Any = None) -> Optional[str]:
+    """
+    Map a client's role (and doctor id) onto the audience whose slice it receives;
+    None for a missing or unknown role (or a doctor without a valid id).
+    """
+    if role == ROLE_DOCTOR:
+        try:
+            return f"{ROLE_DOCTOR}:{int(doctor_id)}"
+        except (TypeError, ValueError):
+            return None
+    if role in (ROLE_STAFF, ROLE_DISPLAY, ROLE_KIOSK):
+        return role
+    return None
+
+
+def room_name(audience: str, encoding: str) -> str:
+    """Room holding every client of `audience` that negotiated `encoding`."""
+    return f"{audience}|{encoding}"
+
+
+def project_snapshot(snapshot: dict, audience: str) -> dict:
+    """The slice of a queue snapshot an audience is sent."""
+    queue, stats = snapshot["queue"], snapshot["stats"]
+    if audience == ROLE_KIOSK:
+        return {"stats": stats}
+    if audience == ROLE_DISPLAY:
+        head = queue[:settings.DISPLAY_TOP_N]
+        return {
+            "queue": [{k: e.get(k) for k in DISPLAY_ENTRY_FIELDS} for e in head],
+            "stats": stats,
+        }
+    if audience.startswith(f"{ROLE_DOCTOR}:"):
+        doctor_id = int(audience.split(":", 1)[1])
+        # Assigned to this doctor, or unassigned and therefore claimable
+        worklist = [e for e in queue if e["assigned_doctor_id"] in (doctor_id, None)]
+        return {"queue": worklist, "stats": stats}
+    return snapshot
+
+
+async def _sync(sid: str, audience: str, encoding: str, since: Optional[int] = None) -> None:
+    """
+    Bring one client up to date. With `since` (the last version it applied) it gets
+    a single delta covering everything it missed, if that version is still in the
+    replay log; otherwise — and on first sync — a full snapshot of its slice.
+    """
+    snapshot = await _load_last_snapshot()
+    if snapshot is None:
+        return
+    version = snapshot["version"]
+
+    if since is not None and since == version:
+        return
+    if since is not None and since < version:
+        base = await _load_snapshot_at(since)
+        if base is not None:
+            delta = _audience_delta(base, snapshot, audience) or {}
+            delta.update(version=version, base_version=since)
+            await sio.emit("queue_delta", encode_payload(delta, encoding), to=sid)
+            return
+
+    payload = {**project_snapshot(snapshot, audience), "version": version}
+    await sio.emit("queue_updated", encode_payload(payload, encoding), to=sid)
+
+
+async def _join(sid: str, audience: str, encoding: str, since: Optional[int] = None) -> None:
+    """Move a client into its (audience, encoding) room and sync it."""
+    session = await sio.get_session(sid)
+    room = room_name(audience, encoding)
+    old_room = session.get("room")
+    if old_room != room:
+        if old_room:
+            await sio.leave_room(sid, old_room)
+        await sio.enter_room(sid, room)
+        await sio.save_session(
+            sid, {**session, "room": room, "audience": audience, "encoding": encoding}
+        )
+
+    # Initial sync / resume: the only time a client gets a full snapshot; deltas follow
+    await _sync(sid, audience, encoding, since)
+    if old_room != room and audience != ROLE_KIOSK:
+        await _send_dashboard_sync(sid, audience)
+
+
+async def _send_dashboard_sync(sid: str, audience: str) -> None:
+    """
+    Initial-sync counterpart of GET /api/dashboard: roster, stats and (for staff)
+    recent events, read by build_dashboard(). The queue itself is not repeated —
+    it arrives versioned through `queue_updated` / `queue_delta`.
+    """
+    from database import AsyncSessionLocal
+    from dashboard import build_dashboard
+
+    events_limit = DASHBOARD_SYNC_EVENTS if audience == ROLE_STAFF else 0
+    try:
+        async with AsyncSessionLocal() as db:
+            snapshot = await build_dashboard(db, include_queue=False, events_limit=events_limit)
+    except Exception as exc:
+        print(f"[WS] dashboard_sync failed for {sid}: {exc}")
+        return
+    await sio.emit("dashboard_sync", snapshot, to=sid)
+
+
 # ─────────────────────────── Connection Handlers ──────────────────────────────
 
 @sio.event
 async def connect(sid, environ, auth=None):
+    """
+    Clients name their role (and doctor_id) in the handshake auth, so the first
+    thing they receive is their own slice. A reconnecting client also passes the
+    last `version` it applied and is sent only what it missed.
+    """
     print(f"[WS] Client connected: {sid}")
+    auth = auth or {}
+    encoding = negotiate_encoding(auth.get("encoding"))
+    await sio.save_session(sid, {"encoding": encoding})
+    audience = audience_for(auth.get("role"), auth.get("doctor_id"))
+    if audience is not None:
+        await _join(sid, audience, encoding, _as_version(auth.get("version")))
+
+
+@sio.event
+async def join(sid, data=None):
+    """Switch role after connecting (single-page app changing screens)."""
+    data = data or {}
+    audience = audience_for(data.get("role"), data.get("doctor_id"))
+    if audience is None:
+        return
+    session = await sio.get_session(sid)
+    await _join(
+        sid,
+        audience,
+        session.get("encoding", negotiate_encoding(None)),
+        _as_version(data.get("version")),
+    )
+
+
+@sio.event
+async def resume(sid, data=None):
+    """A client detected a version gap: replay the changes since its `version`."""
+    session = await sio.get_session(sid)
+    if "audience" not in session:
+        return
+    await _sync(sid, session["audience"], session["encoding"], _as_version((data or {}).get("version")))
 
 
 @sio.event
@@ -32,14 +209,190 @@ async def ping(sid, data=None):
     await sio.emit("pong", {"status": "ok"}, to=sid)
 
 
+# ───────────────────────────── Queue Deltas ───────────────────────────────────
+
+# Entry fields derived from position / time; clients recompute these after a delta
+DERIVED_ENTRY_FIELDS = ("queue_position", "estimated_wait_minutes", "priority_score")
+
+
+def _stable_ids(prev_index: list[int], ids: list[int]) -> set[int]:
+    """
+    Longest increasing subsequence of previous positions (in current order):
+    the largest set of patients whose relative order did not change.
+    """
+    tails: list[int] = []       # tails[k] = smallest tail prev-index of an LIS of length k+1
+    tail_at: list[int] = []     # position in `ids` of that tail
+    parent: list[int] = [-1] * len(ids)
+    for i, value in enumerate(prev_index):
+        k = bisect_left(tails, value)
+        if k == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[k] = value
+            tail_at[k] = i
+        parent[i] = tail_at[k - 1] if k > 0 else -1
+
+    stable: set[int] = set()
+    i = tail_at[-1] if tail_at else -1
+    while i != -1:
+        stable.add(ids[i])
+        i = parent[i]
+    return stable
+
+
+def _as_version(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def _load_last_snapshot() -> Optional[dict]:
+    from redis_client import get_redis
+    raw = await get_redis().get(SNAPSHOT_KEY)
+    return json.loads(raw) if raw else None
+
+
+async def _load_snapshot_at(version: int) -> Optional[dict]:
+    from redis_client import get_redis
+    raw = await get_redis().hget(HISTORY_KEY, str(version))
+    return json.loads(raw) if raw else None
+
+
+async def _swap_last_snapshot(snapshot: dict) -> Optional[dict]:
+    """
+    Stamp `snapshot` with the next queue version, store it as the new delta base
+    and in the bounded replay log, and return the previous one. One script does
+    all of it, so with several workers and Celery emitting, a snapshot is never
+    stored after one with a higher version. Kept in Redis so deltas emitted by
+    any worker diff against the same base.
+    """
+    from redis_client import swap_versioned_snapshot
+    version, prev_raw = await swap_versioned_snapshot(
+        VERSION_KEY, SNAPSHOT_KEY, HISTORY_KEY, json.dumps(snapshot), settings.REPLAY_LOG_SIZE
+    )
+    snapshot["version"] = version
+    return json.loads(prev_raw) if prev_raw else None
+
+
+async def current_queue_version() -> int:
+    """Version of the last queue snapshot broadcast (0 before the first)."""
+    from redis_client import get_resource_version
+    return await get_resource_version(VERSION_KEY)
+
+
+def compute_queue_delta(prev: list[dict], curr: list[dict], contiguous: bool = True) -> dict:
+    """
+    Diff two ordered queue snapshots.
+
+    Returns {"removed": [id], "inserted": [entry], "moved": [[id, position, ...]],
+    "changed": [{"id": id, <field>: <value>}]}.
+
+    For a contiguous list (positions 1..n) only patients whose relative order changed
+    are reported as moved and clients recompute positions and ETAs for the rest.
+    For a non-contiguous slice (a doctor's worklist) every patient whose position
+    changed is reported as [id, position, estimated_wait_minutes].
+    """
+    prev_by_id = {e["id"]: e for e in prev}
+    curr_ids = [e["id"] for e in curr]
+    curr_id_set = set(curr_ids)
+
+    removed = [e["id"] for e in prev if e["id"] not in curr_id_set]
+    inserted = [e for e in curr if e["id"] not in prev_by_id]
+
+    if contiguous:
+        prev_pos = {e["id"]: i for i, e in enumerate(prev)}
+        common = [pid for pid in curr_ids if pid in prev_by_id]
+        stable = _stable_ids([prev_pos[pid] for pid in common], common)
+        moved = [
+            [e["id"], e["queue_position"]]
+            for e in curr
+            if e["id"] in prev_by_id and e["id"] not in stable
+        ]
+    else:
+        moved = [
+            [e["id"], e["queue_position"], e["estimated_wait_minutes"]]
+            for e in curr
+            if e["id"] in prev_by_id
+            and prev_by_id[e["id"]]["queue_position"] != e["queue_position"]
+        ]
+
+    changed = []
+    for e in curr:
+        old = prev_by_id.get(e["id"])
+        if old is None:
+            continue
+        diff = {
+            k: v for k, v in e.items()
+            if k not in DERIVED_ENTRY_FIELDS and old.get(k) != v
+        }
+        if diff:
+            changed.append({"id": e["id"], **diff})
+
+    return {"removed": removed, "inserted": inserted, "moved": moved, "changed": changed}
+
+
 # ─────────────────────────── Broadcast Helpers ────────────────────────────────
 
+async def _audiences() -> list[str]:
+    """
+    Every audience a client can join: the shared roles plus one per doctor on the
+    roster. Broadcasts go to all of them rather than to a tally of occupied rooms,
+    which a node dying without running its disconnects would leave wrong for good;
+    emitting to an empty room is a no-op.
+    """
+    from redis_client import get_doctor_ids
+    doctor_ids = await get_doctor_ids()
+    return [ROLE_STAFF, ROLE_DISPLAY, ROLE_KIOSK] + [f"{ROLE_DOCTOR}:{d}" for d in sorted(doctor_ids)]
+
+
+def _audience_delta(prev: dict, curr: dict, audience: str) -> Optional[dict]:
+    """Delta between two snapshots as seen by one audience; None if it saw no change."""
+    prev_slice = project_snapshot(prev, audience)
+    curr_slice = project_snapshot(curr, audience)
+    delta: dict = {}
+    if "queue" in curr_slice:
+        contiguous = not audience.startswith(f"{ROLE_DOCTOR}:")
+        delta = compute_queue_delta(prev_slice["queue"], curr_slice["queue"], contiguous)
+        if not any(delta.values()):
+            delta = {}
+        elif not contiguous:
+            delta["reindex"] = False
+    if prev_slice["stats"] != curr_slice["stats"]:
+        delta["stats"] = curr_slice["stats"]
+    if not delta:
+        return None
+    if "queue" in curr_slice:
+        delta["avg_consult_minutes"] = AVG_CONSULT_MINUTES
+    return delta
+
+
 async def broadcast_queue_updated(queue_data: list[dict], stats: dict) -> None:
-    """Emit full queue snapshot to all connected clients."""
-    await sio.emit(
-        "queue_updated",
-        {"queue": queue_data, "stats": stats},
-    )
+    """
+    Emit the queue to every audience as a `queue_delta` against the last snapshot,
+    projected to that audience's slice and encoded once per supported encoding.
+    A full `queue_updated` snapshot is only sent when there is no base yet.
+
+    Every delta carries `version` and `base_version`; audiences whose slice did not
+    change still get an empty delta so their version stays contiguous and clients
+    can detect a missed update (base_version != their version) and `resume`.
+    """
+    snapshot = {"queue": queue_data, "stats": stats}
+    prev = await _swap_last_snapshot(snapshot)
+    version = snapshot["version"]
+
+    encodings = available_encodings()
+    for audience in await _audiences():
+        if prev is None:
+            event = "queue_updated"
+            payload = {**project_snapshot(snapshot, audience), "version": version}
+        else:
+            event = "queue_delta"
+            payload = _audience_delta(prev, snapshot, audience) or {}
+            payload.update(version=version, base_version=prev.get("version", 0))
+        for encoding in encodings:
+            await sio.emit(event, encode_payload(payload, encoding), room=room_name(audience, encoding))
 
 
 async def broadcast_patient_status_changed(
@@ -0,0 +1,124 @@
+"""
+wire_format.py – Compact encodings for queue broadcasts
+
+Clients pick an encoding at connect time (Socket.IO auth {"encoding": ...}):
+  json      – default; keyed dicts, encoded by python-socketio (unchanged behaviour)
+  columnar  – queue entries as {"columns": [...], "rows": [[...]]} with integer epoch
+              timestamps, pre-encoded once to UTF-8 JSON bytes and sent as binary
+"""
+import json
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+ENCODING_JSON = "json"
+ENCODING_COLUMNAR = "columnar"
+
+QUEUE_COLUMNS = (
+    "id",
+    "token_number",
+    "name",
+    "reason",
+    "urgency",
+    "status",
+    "assigned_doctor_id",
+    "assigned_doctor_name",
+    "created_at",
+    "queue_position",
+    "estimated_wait_minutes",
+    "priority_score",
+)
+
+# Payload keys that hold lists of queue entries
+_ENTRY_LIST_KEYS = ("queue", "inserted")
+
+
+def available_encodings() -> list[str]:
+    return [ENCODING_JSON, ENCODING_COLUMNAR]
+
+
+def negotiate_encoding(requested: Optional[str]) -> str:
+    """Map a client's requested encoding onto one this server can produce."""
+    if requested == ENCODING_COLUMNAR:
+        return requested
+    return ENCODING_JSON
+
+
+def _epoch_seconds(value: Any) -> Any:
+    if isinstance(value, str):
+        return int(datetime.fromisoformat(value).timestamp())
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return value
+
+
+def to_columns(entries: list[dict]) -> dict:
+    """Queue entries → {"columns": [...], "rows": [[...], ...]} with epoch created_at."""
+    rows = []
+    for entry in entries:
+        row = [entry.get(col) for col in QUEUE_COLUMNS]
+        row[QUEUE_COLUMNS.index("created_at")] = _epoch_seconds(entry.get("created_at"))
+        rows.append(row)
+    return {"columns": list(QUEUE_COLUMNS), "rows": rows}
+
+
+def compact_payload(payload: dict) -> dict:
+    """Replace every list of queue entries in a payload with its columnar form."""
+    return {
+        key: to_columns(value) if key in _ENTRY_LIST_KEYS else value
+        for key, value in payload.items()
+    }
+
+
+def encode_payload(payload: dict, encoding: str) -> Any:
+    """Encode a payload for one wire encoding (json stays a dict for python-socketio)."""
+    if encoding == ENCODING_JSON:
+        return payload
+    return json.dumps(compact_payload(payload), separators=(",", ":")).encode()
+
+
+def measure(payload: dict, rounds: int = 200) -> dict[str, dict]:
+    """
+    Bytes on the wire and encode time per encoding. The json baseline is measured
+    the way python-socketio encodes it (json.dumps of the keyed dict).
+    """
+    results = {}
+    for encoding in available_encodings():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            data = encode_payload(payload, encoding)
+            if encoding == ENCODING_JSON:
+                data = json.dumps(data).encode()
+        elapsed_us = (time.perf_counter() - start) / rounds * 1e6
+        results[encoding] = {"bytes": len(data), "encode_us": round(elapsed_us, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    # Rough comparison on a synthetic queue: python wire_format.py [queue_length]
+    import sys
+    from datetime import timezone, timedelta
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    now = datetime.now(timezone.utc)
+    queue = [
+        {
+            "id": i,
+            "token_number": i,
+            "name": f"Patient {i}",
+            "reason": "Fever / Cold",
+            "urgency": 1 + i % 10,
+            "status": "waiting",
+            "assigned_doctor_id": 1 + i % 3,
+            "assigned_doctor_name": "Dr. Priya Sharma",
+            "created_at": (now - timedelta(minutes=i)).isoformat(),
+            "queue_position": i + 1,
+            "estimated_wait_minutes": max(1, i * 12),
+            "priority_score": 12.3456,
+        }
+        for i in range(n)
+    ]
+    stats = {"in_queue": n, "in_consultation": 2, "completed_today": 40,
+             "no_shows_today": 1, "avg_wait_minutes": 60, "total_today": n + 43}
+    for encoding, result in measure({"queue": queue, "stats": stats}).items():
+        print(f"{encoding:>9}: {result['bytes']:>7} bytes  {result['encode_us']:>8} us/encode")
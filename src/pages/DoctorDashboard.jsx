@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from 'react'
 import api from '../api'
-import socket from '../socket'
+import socket, { adoptQueueVersion, joinRole, subscribeQueue } from '../socket'
+import { applyQueueDelta } from '../queueDelta'
 
 const HOURLY_DATA = [2, 3, 5, 4, 6, 7, 5, 4, 3]
 const HOURS = ['9AM', '10AM', '11AM', '12PM', '1PM', '2PM', '3PM', '4PM', '5PM']
@@ -75,37 +76,57 @@ export default function DoctorDashboard() {
 
     async function fetchQueue() {
         try {
-            const [qRes, dRes, sRes] = await Promise.all([
-                api.get('/patients/queue'),
-                api.get('/doctors'),
-                api.get('/patients/stats'),
-            ])
-            setQueue(qRes.data)
-            setDoctors(dRes.data)
-            setStats(sRes.data)
+            const { data } = await api.get('/dashboard')
+            setQueue(data.queue)
+            adoptQueueVersion(data.version)
+            setDoctors(data.doctors)
+            setStats(data.stats)
         } catch (error) {
             console.error("API Error:", error.response?.data || error.message);
         }
     }
 
     useEffect(() => {
+        joinRole('doctor', { doctor_id: DOCTOR_ID })
         fetchQueue()
 
-        const onQueueUpdated = (data) => {
-            if (data.queue) setQueue(data.queue)
-            if (data.stats) setStats(data.stats)
+        const unsubscribeQueue = subscribeQueue({
+            onSnapshot: (data) => {
+                if (data.queue) setQueue(data.queue)
+                if (data.stats) setStats(data.stats)
+            },
+            onDelta: (delta) => {
+                setQueue(q => applyQueueDelta(q, delta))
+                if (delta.stats) setStats(delta.stats)
+            },
+        })
+        const onDashboardSync = (data) => {
+            setDoctors(data.doctors)
+            setStats(data.stats)
         }
-        socket.on('queue_updated', onQueueUpdated)
-        socket.on('patient_status_changed', fetchQueue)
-        socket.on('doctor_status_changed', fetchQueue)
-
-        const pollInterval = setInterval(fetchQueue, 20000)
+        // Waiting rows follow the versioned deltas; only the rows outside the
+        // queue (consultations) and the roster are patched from these events
+        const onPatientStatus = (data) => {
+            if (data.status === 'completed' || data.status === 'no_show') {
+                setQueue(q => q.filter(p => p.id !== data.patient_id || p.status === 'waiting'))
+            }
+        }
+        const onDoctorStatus = (data) => {
+            setDoctors(prev => prev.map(d =>
+                d.id === data.doctor_id
+                    ? { ...d, is_active: data.is_active, is_on_break: data.is_on_break, current_patient_id: data.current_patient_id }
+                    : d
+            ))
+        }
+        socket.on('dashboard_sync', onDashboardSync)
+        socket.on('patient_status_changed', onPatientStatus)
+        socket.on('doctor_status_changed', onDoctorStatus)
 
         return () => {
-            socket.off('queue_updated', onQueueUpdated)
-            socket.off('patient_status_changed', fetchQueue)
-            socket.off('doctor_status_changed', fetchQueue)
-            clearInterval(pollInterval)
+            unsubscribeQueue()
+            socket.off('dashboard_sync', onDashboardSync)
+            socket.off('patient_status_changed', onPatientStatus)
+            socket.off('doctor_status_changed', onDoctorStatus)
         }
     }, [])
 
@@ -166,7 +187,10 @@ export default function DoctorDashboard() {
         }
     }
 
-    const waitingQueue = queue.filter(p => p.status === 'waiting')
+    // Worklist: patients assigned to this doctor or still unassigned (claimable)
+    const waitingQueue = queue.filter(p =>
+        p.status === 'waiting' && (p.assigned_doctor_id == null || p.assigned_doctor_id === DOCTOR_ID)
+    )
     const doctor = doctors.find(d => d.id === DOCTOR_ID)
     const maxBar = Math.max(...HOURLY_DATA)
 
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import api from '../api'
-import socket from '../socket'
+import socket, { adoptQueueVersion, joinRole, subscribeQueue } from '../socket'
+import { applyQueueDelta } from '../queueDelta'
 
 function StatusBadge({ status }) {
     const map = {
@@ -99,27 +100,32 @@ export default function LiveQueueDisplay() {
 
     async function fetchAll() {
         try {
-            const [qRes, dRes] = await Promise.all([
-                api.get('/patients/queue'),
-                api.get('/doctors'),
-            ])
-            setQueue(qRes.data)
-            setDoctors(dRes.data)
+            const { data } = await api.get('/dashboard', { params: { display: true } })
+            setQueue(data.queue)
+            adoptQueueVersion(data.version)
+            setDoctors(data.doctors)
+            setStats(data.stats)
         } catch { /* keep last state */ }
-
-        try {
-            const sRes = await api.get('/patients/stats')
-            setStats(sRes.data)
-        } catch { }
     }
 
     useEffect(() => {
+        joinRole('display')
         fetchAll()
 
         // Real-time updates via Socket.IO
-        const onQueueUpdated = (data) => {
-            if (data.queue) setQueue(data.queue)
-            if (data.stats) setStats(data.stats)
+        const unsubscribeQueue = subscribeQueue({
+            onSnapshot: (data) => {
+                if (data.queue) setQueue(data.queue)
+                if (data.stats) setStats(data.stats)
+            },
+            onDelta: (delta) => {
+                setQueue(q => applyQueueDelta(q, delta))
+                if (delta.stats) setStats(delta.stats)
+            },
+        })
+        const onDashboardSync = (data) => {
+            setDoctors(data.doctors)
+            setStats(data.stats)
         }
         const onDoctorStatus = (data) => {
             setDoctors(prev => prev.map(d =>
@@ -143,20 +149,17 @@ export default function LiveQueueDisplay() {
             }
         }
 
-        socket.on('queue_updated', onQueueUpdated)
+        socket.on('dashboard_sync', onDashboardSync)
         socket.on('doctor_status_changed', onDoctorStatus)
         socket.on('emergency_added', onEmergency)
         socket.on('patient_status_changed', onPatientStatus)
 
-        // Polling fallback every 15s
-        const pollInterval = setInterval(fetchAll, 15000)
-
         return () => {
-            socket.off('queue_updated', onQueueUpdated)
+            unsubscribeQueue()
+            socket.off('dashboard_sync', onDashboardSync)
             socket.off('doctor_status_changed', onDoctorStatus)
             socket.off('emergency_added', onEmergency)
             socket.off('patient_status_changed', onPatientStatus)
-            clearInterval(pollInterval)
         }
     }, [])
 
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react'
 import api from '../api'
-import socket from '../socket'
+import { joinRole, subscribeQueue } from '../socket'
 
 
 function FloatingToken({ token, style, className }) {
@@ -50,6 +50,7 @@ export default function PatientRegistration() {
     const [stats, setStats] = useState({ total_today: 47, avg_wait_minutes: 22, in_consultation: 3 })
 
     useEffect(() => {
+        joinRole('kiosk')
         // Fetch live stats
         api.get('/patients/stats')
             .then(r => setStats(r.data))
@@ -59,8 +60,7 @@ export default function PatientRegistration() {
         const handler = (data) => {
             if (data.stats) setStats(s => ({ ...s, ...data.stats }))
         }
-        socket.on('queue_updated', handler)
-        return () => socket.off('queue_updated', handler)
+        return subscribeQueue({ onSnapshot: handler, onDelta: handler })
     }, [])
 
     const sliderColor = () => {
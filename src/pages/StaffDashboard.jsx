@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from 'react'
 import api from '../api'
-import socket from '../socket'
+import socket, { adoptQueueVersion, joinRole, subscribeQueue } from '../socket'
+import { applyQueueDelta } from '../queueDelta'
 
 function PriorityBadge({ urgency }) {
     if (urgency >= 9) return <span className="badge badge-red">🚨 critical</span>
@@ -51,34 +52,42 @@ export default function StaffDashboard() {
 
     async function fetchAll() {
         try {
-            const [qRes, dRes, sRes, logRes] = await Promise.all([
-                api.get('/patients/queue'),
-                api.get('/doctors'),
-                api.get('/patients/stats'),
-                api.get('/staff/logs').catch(() => ({ data: [] })),
-            ])
-            setQueue(qRes.data)
-            setDoctors(dRes.data)
-            setStats(sRes.data)
-            if (logRes.data?.length > 0) {
-                setLog(logRes.data.map(e => ({
-                    time: new Date(e.timestamp).toLocaleTimeString('en-IN', { hour: '2-digit', minute: '2-digit' }),
-                    msg: `${e.event_type.replace(/_/g, ' ')} — ref #${e.reference_id || '—'}`,
-                    type: e.event_type.includes('emergency') ? 'error' :
-                        e.event_type.includes('complete') ? 'success' :
-                            e.event_type.includes('noshow') ? 'warn' : 'info',
-                })))
-            }
+            const { data } = await api.get('/dashboard', { params: { events: 50 } })
+            setQueue(data.queue)
+            adoptQueueVersion(data.version)
+            applyDashboard(data)
         } catch { }
     }
 
+    // Roster, stats and recent events — from GET /dashboard or the socket's dashboard_sync
+    function applyDashboard(data) {
+        setDoctors(data.doctors)
+        setStats(data.stats)
+        if (data.events?.length > 0) {
+            setLog(data.events.map(e => ({
+                time: new Date(e.timestamp).toLocaleTimeString('en-IN', { hour: '2-digit', minute: '2-digit' }),
+                msg: `${e.event_type.replace(/_/g, ' ')} — ref #${e.reference_id || '—'}`,
+                type: e.event_type.includes('emergency') ? 'error' :
+                    e.event_type.includes('complete') ? 'success' :
+                        e.event_type.includes('noshow') ? 'warn' : 'info',
+            })))
+        }
+    }
+
     useEffect(() => {
+        joinRole('staff')
         fetchAll()
 
-        const onQueueUpdated = (data) => {
-            if (data.queue) setQueue(data.queue)
-            if (data.stats) setStats(data.stats)
-        }
+        const unsubscribeQueue = subscribeQueue({
+            onSnapshot: (data) => {
+                if (data.queue) setQueue(data.queue)
+                if (data.stats) setStats(data.stats)
+            },
+            onDelta: (delta) => {
+                setQueue(q => applyQueueDelta(q, delta))
+                if (delta.stats) setStats(delta.stats)
+            },
+        })
         const onDoctorStatus = (data) => {
             setDoctors(prev => prev.map(d =>
                 d.id === data.doctor_id ? { ...d, ...data } : d
@@ -93,19 +102,17 @@ export default function StaffDashboard() {
             addLog(`🚨 EMERGENCY Token #${String(data.token_number).padStart(3, '0')} — ${data.name} — queue reshuffled`, 'error')
         }
 
-        socket.on('queue_updated', onQueueUpdated)
+        socket.on('dashboard_sync', applyDashboard)
         socket.on('doctor_status_changed', onDoctorStatus)
         socket.on('patient_status_changed', onPatientStatus)
         socket.on('emergency_added', onEmergency)
 
-        const pollInterval = setInterval(fetchAll, 20000)
-
         return () => {
-            socket.off('queue_updated', onQueueUpdated)
+            unsubscribeQueue()
+            socket.off('dashboard_sync', applyDashboard)
             socket.off('doctor_status_changed', onDoctorStatus)
             socket.off('patient_status_changed', onPatientStatus)
             socket.off('emergency_added', onEmergency)
-            clearInterval(pollInterval)
         }
     }, [])
 
@@ -0,0 +1,52 @@
+// Apply a server `queue_delta` event to a locally held queue.
+// Only waiting entries take part in the ordering; other entries (e.g. the
+// in-consultation rows from REST) are kept after them untouched.
+// Deltas for a non-contiguous slice (a doctor's worklist) carry `reindex: false`
+// and explicit [id, position, wait] moves instead of relying on list order.
+export function applyQueueDelta(queue, delta) {
+    const waiting = queue.filter(p => p.status === 'waiting')
+    const others = queue.filter(p => p.status !== 'waiting')
+    if (delta.reindex === false) return applySliceDelta(waiting, others, delta)
+
+    const byId = new Map(waiting.map(p => [p.id, p]))
+    for (const change of delta.changed || []) {
+        if (byId.has(change.id)) byId.set(change.id, { ...byId.get(change.id), ...change })
+    }
+
+    const movedIds = new Set((delta.moved || []).map(([id]) => id))
+    const insertedIds = new Set((delta.inserted || []).map(p => p.id))
+    const removedIds = new Set(delta.removed || [])
+    const list = waiting
+        .filter(p => !removedIds.has(p.id) && !movedIds.has(p.id) && !insertedIds.has(p.id))
+        .map(p => byId.get(p.id))
+
+    const placed = [
+        ...(delta.inserted || []),
+        ...(delta.moved || [])
+            .filter(([id]) => byId.has(id))
+            .map(([id, position]) => ({ ...byId.get(id), queue_position: position })),
+    ].sort((a, b) => a.queue_position - b.queue_position)
+    for (const p of placed) list.splice(p.queue_position - 1, 0, p)
+
+    const avg = delta.avg_consult_minutes || 12
+    const reindexed = list.map((p, i) => ({
+        ...p,
+        queue_position: i + 1,
+        estimated_wait_minutes: Math.max(1, i * avg),
+    }))
+    return [...reindexed, ...others.filter(p => !removedIds.has(p.id))]
+}
+
+function applySliceDelta(waiting, others, delta) {
+    const removedIds = new Set(delta.removed || [])
+    const byId = new Map(waiting.filter(p => !removedIds.has(p.id)).map(p => [p.id, p]))
+    for (const change of delta.changed || []) {
+        if (byId.has(change.id)) byId.set(change.id, { ...byId.get(change.id), ...change })
+    }
+    for (const [id, position, wait] of delta.moved || []) {
+        if (byId.has(id)) byId.set(id, { ...byId.get(id), queue_position: position, estimated_wait_minutes: wait })
+    }
+    for (const p of delta.inserted || []) byId.set(p.id, p)
+    const list = [...byId.values()].sort((a, b) => a.queue_position - b.queue_position)
+    return [...list, ...others.filter(p => !removedIds.has(p.id))]
+}
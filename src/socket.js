@@ -1,9 +1,25 @@
 import { io } from 'socket.io-client'
+import { decodeQueuePayload } from './wireFormat'
 
 const SOCKET_URL = import.meta.env.VITE_API_URL;
 
+// Role-scoped rooms: each screen only receives its own slice of queue updates
+let currentRole = null
+// Role sent in the last handshake (the server sends nothing to a connection without one)
+let handshakeRole = null
+
+// Last queue version applied; sent on reconnect so the server replays only what we missed
+let queueVersion = null
+let resumePending = false
+
 const socket = io(SOCKET_URL, {
     path: '/socket.io',
+    // Evaluated on every (re)connect, so the server knows the role before sending
+    // anything, and a reconnecting screen resumes from the last version it applied
+    auth: (cb) => {
+        handshakeRole = currentRole
+        cb({ encoding: 'columnar', ...(currentRole || {}), version: queueVersion })
+    },
     transports: ['websocket', 'polling'],
     autoConnect: true,
     reconnection: true,
@@ -12,8 +28,64 @@ const socket = io(SOCKET_URL, {
     reconnectionDelayMax: 5000,
 })
 
+export function joinRole(role, extra = {}) {
+    currentRole = { role, ...extra }
+    queueVersion = null  // new screen, new state: start from a snapshot
+    if (socket.connected) socket.emit('join', currentRole)
+}
+
+/**
+ * Take the queue `version` of a REST snapshot (GET /dashboard) the caller just
+ * put in place of its queue state. That state is at least as new as the version,
+ * so deltas from it re-apply cleanly; a gap still triggers a `resume`.
+ */
+export function adoptQueueVersion(version) {
+    if (version == null) return
+    queueVersion = version
+    resumePending = false
+}
+
+/**
+ * Subscribe to versioned queue updates. Snapshots replace state; deltas are only
+ * handed on when they extend the version we hold — on a gap we ask the server to
+ * `resume` from our version instead of applying a delta to the wrong base.
+ */
+export function subscribeQueue({ onSnapshot, onDelta }) {
+    const handleSnapshot = (raw) => {
+        const data = decodeQueuePayload(raw)
+        if (data.version != null) queueVersion = data.version
+        resumePending = false
+        onSnapshot(data)
+    }
+    const handleDelta = (raw) => {
+        const delta = decodeQueuePayload(raw)
+        if (queueVersion != null && delta.base_version != null && delta.base_version !== queueVersion) {
+            if (!resumePending) {
+                resumePending = true
+                socket.emit('resume', { version: queueVersion })
+            }
+            return
+        }
+        if (delta.version != null) queueVersion = delta.version
+        resumePending = false
+        // Version-only deltas just keep our version contiguous
+        if (Object.keys(delta).some(k => k !== 'version' && k !== 'base_version')) onDelta(delta)
+    }
+    socket.on('queue_updated', handleSnapshot)
+    socket.on('queue_delta', handleDelta)
+    return () => {
+        socket.off('queue_updated', handleSnapshot)
+        socket.off('queue_delta', handleDelta)
+    }
+}
+
 socket.on('connect', () => {
     console.log('[Socket.IO] Connected:', socket.id)
+    resumePending = false
+    // Only when the role was chosen after the handshake went out
+    if (currentRole && currentRole !== handshakeRole) {
+        socket.emit('join', { ...currentRole, version: queueVersion })
+    }
 })
 
 socket.on('disconnect', (reason) => {
@@ -0,0 +1,24 @@
+// Decode queue payloads sent in the compact "columnar" wire encoding.
+// The server sends them as pre-encoded UTF-8 JSON (binary frames) with queue
+// entries as { columns, rows } and created_at as integer epoch seconds.
+const decoder = new TextDecoder()
+
+function fromColumns({ columns, rows }) {
+    return rows.map(row => {
+        const entry = {}
+        columns.forEach((col, i) => { entry[col] = row[i] })
+        if (typeof entry.created_at === 'number') {
+            entry.created_at = new Date(entry.created_at * 1000).toISOString()
+        }
+        return entry
+    })
+}
+
+export function decodeQueuePayload(data) {
+    if (!(data instanceof ArrayBuffer) && !ArrayBuffer.isView(data)) return data
+    const payload = JSON.parse(decoder.decode(data))
+    for (const key of ['queue', 'inserted']) {
+        if (payload[key] && payload[key].columns) payload[key] = fromColumns(payload[key])
+    }
+    return payload
+}